@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Benchmark: binary capture store vs the nmea_data.log text logger
+#
+# Appends the same AIS/GPS sentences through CaptureWriter (group commit) and
+# through a RotatingFileHandler like nmea_logger, then reads the capture back
+# and times seeks to random instants with the sparse index.
+#
+# Usage:
+#   python benchmarks/bench_capture.py
+#   python benchmarks/bench_capture.py --count 1000000 --seeks 200
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import logging
+import tempfile
+from logging.handlers import RotatingFileHandler
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from nmea_server import CaptureWriter, CaptureReader  # noqa: E402
+
+import gevent  # noqa: E402
+
+SAMPLE_SENTENCES = [
+    ("UDP", "!AIVDM,1,1,,B,177KQJ5000G?tO`K>RA1wUbN0TKH,0*5C"),
+    ("UDP", "!AIVDM,2,1,3,B,55P5TL01VIaAL@7WKO@mBplU@<PDhh000000001S;AJ::4A80?4i@E53,0*3E"),
+    ("UDP", "!AIVDM,2,2,3,B,1@0000000000000,2*55"),
+    ("SERIAL", "$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A"),
+    ("SERIAL", "$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47"),
+]
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def bench_capture(directory, count, rate):
+    writer = CaptureWriter(directory, segment_bytes=64 * 1024 * 1024, commit_interval=0.2, retention_hours=0)
+    writer.start()
+    base = time.time() - count / rate
+    n = len(SAMPLE_SENTENCES)
+    start = time.perf_counter()
+    for i in range(count):
+        source, raw = SAMPLE_SENTENCES[i % n]
+        writer.append(source, raw, base + i / rate)
+        if i % 10000 == 0:
+            gevent.sleep(0)  # let the committer run, as the ingest greenlets would
+    append_time = time.perf_counter() - start
+    writer.stop()
+    return append_time, time.perf_counter() - start, base
+
+
+def bench_text_log(directory, count):
+    logger = logging.getLogger("bench_nmea_data")
+    logger.propagate = False
+    handler = RotatingFileHandler(os.path.join(directory, "nmea_data.log"), maxBytes=2 * 1024 * 1024,
+                                  backupCount=5, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    n = len(SAMPLE_SENTENCES)
+    start = time.perf_counter()
+    for i in range(count):
+        source, raw = SAMPLE_SENTENCES[i % n]
+        logger.info(f"[{source}] {raw}")
+    elapsed = time.perf_counter() - start
+    logger.removeHandler(handler)
+    handler.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture store benchmark")
+    parser.add_argument("--count", type=int, default=300000, help="sentences to record")
+    parser.add_argument("--rate", type=float, default=1000.0, help="simulated sentences per second (timestamps)")
+    parser.add_argument("--seeks", type=int, default=100, help="random time seeks to measure")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_capture_")
+    try:
+        capture_dir = os.path.join(root, "capture")
+        text_dir = os.path.join(root, "text")
+        os.makedirs(text_dir)
+
+        append_time, total_time, base = bench_capture(capture_dir, args.count, args.rate)
+        size = directory_size(capture_dir)
+        print(f"capture: {args.count / append_time:,.0f} appends/s, {args.count / total_time:,.0f}/s incl. final commit, "
+              f"{size / args.count:.1f} bytes/sentence")
+
+        text_time = bench_text_log(text_dir, args.count)
+        print(f"text log: {args.count / text_time:,.0f} lines/s (RotatingFileHandler, 2 MB x 5 files)")
+
+        reader = CaptureReader(capture_dir)
+        start = time.perf_counter()
+        read = sum(1 for _ in reader.read())
+        elapsed = time.perf_counter() - start
+        print(f"read back: {read:,} records, {read / elapsed:,.0f} records/s")
+
+        span = args.count / args.rate
+        latencies = []
+        for _ in range(args.seeks):
+            target = int((base + random.uniform(0, span)) * 1e9)
+            start = time.perf_counter()
+            next(reader.read(target), None)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"seek by time: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Micro-benchmark: NMEALineFramer vs the former str-based "buffer += data / split" framing
+#
+# Usage:
+#   python benchmarks/bench_framer.py                  # synthetic 8 MB stream
+#   python benchmarks/bench_framer.py capture.nmea     # replay a captured stream
+#   python benchmarks/bench_framer.py --size-mb 32
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from nmea_server import NMEALineFramer  # noqa: E402
+
+SAMPLE_SENTENCES = [
+    b"$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A\r\n",
+    b"$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47\r\n",
+    b"$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48\r\n",
+    b"$HEHDT,274.07,T*19\r\n",
+    b"!AIVDM,1,1,,B,177KQJ5000G?tO`K>RA1wUbN0TKH,0*5C\r\n",
+    b"!AIVDM,2,1,3,B,55P5TL01VIaAL@7WKO@mBplU@<PDhh000000001S;AJ::4A80?4i@E53,0*3E\r\n",
+    b"!AIVDM,2,2,3,B,1@0000000000000,2*55\r\n",
+]
+
+
+def legacy_framing(chunks):
+    """Former listener loop: decode every chunk, concatenate, split one line at a time"""
+    lines = 0
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.decode('utf-8', errors='ignore')
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            if line.strip():
+                lines += 1
+    return lines
+
+
+def framer_framing(chunks):
+    """New shared framer"""
+    lines = 0
+    framer = NMEALineFramer("BENCH", max_line_length=1 << 30)
+    for chunk in chunks:
+        lines += len(framer.feed(chunk))
+    return lines
+
+
+def build_stream(size_mb):
+    stream = bytearray()
+    target = size_mb * 1024 * 1024
+    i = 0
+    while len(stream) < target:
+        stream += SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]
+        i += 1
+    return bytes(stream)
+
+
+def split_chunks(stream, chunk_size):
+    return [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+
+def best_of(func, chunks, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(chunks)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NMEA line framer micro-benchmark")
+    parser.add_argument("capture", nargs="?", help="captured NMEA byte stream (default: synthetic)")
+    parser.add_argument("--size-mb", type=int, default=8, help="size of the synthetic stream")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.capture:
+        with open(args.capture, "rb") as f:
+            stream = f.read()
+        label = args.capture
+    else:
+        stream = build_stream(args.size_mb)
+        label = "synthetic"
+
+    print(f"Stream: {label}, {len(stream) / 1e6:.1f} MB")
+    print(f"{'chunk':>8} {'legacy (s)':>12} {'framer (s)':>12} {'speedup':>8} {'lines':>10}")
+    # 1 KB = former recv() size, larger chunks = bursts / serial in_waiting backlogs
+    for chunk_size in (1024, 4096, 65536, 1024 * 1024):
+        chunks = split_chunks(stream, chunk_size)
+        legacy_time, legacy_lines = best_of(legacy_framing, chunks, args.repeat)
+        framer_time, framer_lines = best_of(framer_framing, chunks, args.repeat)
+        if legacy_lines != framer_lines:
+            print(f"WARNING: line count mismatch ({legacy_lines} vs {framer_lines})")
+        print(f"{chunk_size:>8} {legacy_time:>12.3f} {framer_time:>12.3f} {legacy_time / framer_time:>7.1f}x {framer_lines:>10}")
+
+
+if __name__ == "__main__":
+    main()
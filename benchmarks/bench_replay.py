@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Benchmark: replay a recording through the full emit pipeline at full speed
+#
+# Plays a capture directory or an nmea_data.log through ReplaySession (speed 0)
+# so every sentence goes through sanitize -> rate limit -> parse -> dedup ->
+# AIS decode -> history -> routing, and reports sentences/s. Without an
+# argument a capture of the built-in samples is recorded to a temp directory.
+# The REPLAY source rate limit is lifted (RATE_LIMIT_SOURCES=REPLAY=0).
+#
+# Usage:
+#   python benchmarks/bench_replay.py
+#   python benchmarks/bench_replay.py captures
+#   python benchmarks/bench_replay.py logs/nmea_data.log --passes 5
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+os.environ.setdefault("RATE_LIMIT_SOURCES", "REPLAY=0")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from nmea_server import CaptureWriter, ReplaySession, ingest_engine, nmea_parser  # noqa: E402
+
+SAMPLE_SENTENCES = [
+    ("UDP", "!AIVDM,1,1,,B,177KQJ5000G?tO`K>RA1wUbN0TKH,0*5C"),
+    ("UDP", "!AIVDM,2,1,3,B,55P5TL01VIaAL@7WKO@mBplU@<PDhh000000001S;AJ::4A80?4i@E53,0*3E"),
+    ("UDP", "!AIVDM,2,2,3,B,1@0000000000000,2*55"),
+    ("SERIAL", "$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A"),
+    ("SERIAL", "$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47"),
+]
+
+
+def record_samples(directory, count):
+    writer = CaptureWriter(directory, segment_bytes=64 * 1024 * 1024, commit_interval=0.2, retention_hours=0)
+    writer.start()
+    base = time.time() - count / 1000.0
+    for i in range(count):
+        source, raw = SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)]
+        writer.append(source, raw, base + i / 1000.0)
+    writer.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-speed replay benchmark")
+    parser.add_argument("recording", nargs="?", help="capture directory or nmea_data.log (default: recorded samples)")
+    parser.add_argument("--count", type=int, default=200000, help="sentences recorded when no recording is given")
+    parser.add_argument("--passes", type=int, default=3)
+    args = parser.parse_args()
+
+    root = None
+    path = args.recording
+    if path is None:
+        root = tempfile.mkdtemp(prefix="bench_replay_")
+        path = root
+        record_samples(path, args.count)
+    try:
+        best = None
+        for _ in range(args.passes):
+            session = ReplaySession(path, speed=0)
+            start = time.perf_counter()
+            source = ingest_engine.start("REPLAY", session.run)
+            source.join()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        stats = session.get_stats()
+        if session.state != 'finished' or not stats['records']:
+            print(f"Nothing replayed from {path} ({session.state})")
+            return 1
+        print(f"{path}: {stats['records']:,} sentences per pass, best {best:.3f}s "
+              f"-> {stats['records'] / best:,.0f} sentences/s ({stats['emitted']:,} emitted)")
+        print(f"parse stage: {nmea_parser.get_stats()}")
+    finally:
+        if root:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
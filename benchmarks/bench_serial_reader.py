@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Benchmark: serial read modes (event/readv, thread, legacy in_waiting poll) against a pty-based fake GPS
+#
+# A writer greenlet plays a GPS on the master side of a pseudo-terminal
+# (bursts of sentences at --rate Hz); the reader under test opens the slave
+# side with pyserial. Reported per mode: latency from burst write to framed
+# sentence, and CPU time/wake-ups while busy and while the port is idle.
+#
+# Usage (POSIX only, needs pyserial and gevent):
+#   python benchmarks/bench_serial_reader.py
+#   python benchmarks/bench_serial_reader.py --rate 10 --seconds 5 --idle 5
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from nmea_server import SerialReader, NMEALineFramer  # noqa: E402  (applies gevent monkey patching)
+
+import gevent  # noqa: E402
+import serial  # noqa: E402
+
+GPS_BURST = [
+    b"$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A\r\n",
+    b"$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47\r\n",
+    b"$GPVTG,054.7,T,034.4,M,005.5,N,010.2,K*48\r\n",
+    b"$HEHDT,274.07,T*19\r\n",
+]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+def run(mode, rate, seconds, idle):
+    master, slave = os.openpty()
+    port = os.ttyname(slave)
+    ser = serial.Serial(port, 4800, timeout=0.1)
+    reader = SerialReader(ser, mode)
+    framer = NMEALineFramer("BENCH")
+    written = []  # perf_counter of each burst
+    latencies = []
+    framed = [0]
+
+    def consume():
+        while True:
+            data = reader.read()
+            if not data:
+                continue
+            now = time.perf_counter()
+            for _ in framer.feed(data):
+                burst = framed[0] // len(GPS_BURST)
+                if burst < len(written):
+                    latencies.append(now - written[burst])
+                framed[0] += 1
+
+    consumer = gevent.spawn(consume)
+    gevent.sleep(0.2)
+
+    # Busy phase: one burst every 1/rate s
+    payload = b"".join(GPS_BURST)
+    cpu = time.process_time()
+    for _ in range(int(seconds * rate)):
+        written.append(time.perf_counter())
+        os.write(master, payload)
+        gevent.sleep(1.0 / rate)
+    gevent.sleep(0.2)
+    busy_cpu = time.process_time() - cpu
+
+    # Idle phase: nothing written
+    wakeups = reader.stats['idle_wakeups']
+    cpu = time.process_time()
+    gevent.sleep(idle)
+    idle_cpu = time.process_time() - cpu
+    idle_wakeups = reader.stats['idle_wakeups'] - wakeups
+
+    consumer.kill()
+    ser.close()
+    os.close(master)
+    os.close(slave)
+    return reader.mode, latencies, framed[0], busy_cpu, idle_cpu, idle_wakeups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial read mode benchmark (pty fake GPS)")
+    parser.add_argument("--rate", type=float, default=10.0, help="GPS bursts per second")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of the busy phase")
+    parser.add_argument("--idle", type=float, default=5.0, help="duration of the idle phase")
+    args = parser.parse_args()
+
+    if not hasattr(os, "openpty"):
+        print("pty not available on this platform")
+        return 1
+
+    print(f"Fake GPS: {len(GPS_BURST)} sentences per burst at {args.rate:g} Hz, "
+          f"{args.seconds:g}s busy + {args.idle:g}s idle")
+    print(f"{'mode':8} {'lines':>7} {'p50 ms':>8} {'p99 ms':>8} {'busy CPU':>9} {'idle CPU':>9} {'idle wake-ups':>14}")
+    for mode in ("event", "thread", "poll"):
+        name, latencies, lines, busy_cpu, idle_cpu, idle_wakeups = run(mode, args.rate, args.seconds, args.idle)
+        print(f"{name:8} {lines:7d} {percentile(latencies, 0.5) * 1000:8.2f} {percentile(latencies, 0.99) * 1000:8.2f} "
+              f"{busy_cpu:8.3f}s {idle_cpu:8.3f}s {idle_wakeups:14d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Equivalence check: sanitize_nmea_sentence vs the former clean_nmea_data
+#
+# Generates a randomized corpus built from the cases the sanitizer special-cases
+# (repeater prefixes, '$' runs, control characters, Unicode whitespace, real
+# sentences) and asserts that the sentence returned by sanitize_nmea_sentence()
+# is identical to the output of the original three re.sub() implementation.
+# Exits with status 1 and prints the first mismatches otherwise. Also reports
+# the speed of both.
+#
+# Usage:
+#   python benchmarks/check_sanitizer.py
+#   python benchmarks/check_sanitizer.py --count 1000000 --seed 7
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from nmea_server import sanitize_nmea_sentence  # noqa: E402
+
+
+def reference_clean_nmea_data(data):
+    """clean_nmea_data() as it was before the precompiled sanitizer"""
+    data = re.sub(r'^\$[A-Z0-9]{2,6}\$', '$', data)
+    data = re.sub(r'\$+', '$', data)
+    data = re.sub(r'[\r\n\x00-\x1F]', '', data)
+    return data.strip()
+
+
+SENTENCES = [
+    "$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,*47",
+    "$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A",
+    "!AIVDM,1,1,,B,177KQJ5000G?tO`K>RA1wUbN0TKH,0*5C",
+    "!AIVDM,2,2,3,B,1@0000000000000,2*55",
+    "$HEHDT,274.07,T*19",
+    "$PGRMZ,246,f,3*1B",
+    "$GPGSV,3,1,11,03,03,111,00,04,15,270,00,06,01,010,00,13,06,292,00*74",
+    "",
+]
+FRAGMENTS = [
+    "$", "$$", "$$$", "!", ",", "*", "*47", "GP", "AI", "VDM", "\r", "\n", "\r\n", "\x00", "\x1f", "\t",
+    "\x7f", " ", "  ", " ", " ", "　", "\x85", "é", "a", "Z9",
+]
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+def random_prefix(rng):
+    """$XX$ .. $XXXXXX$ repeater prefixes, plus near misses (lower case, 1 or 7 chars)"""
+    length = rng.choice([1, 2, 3, 4, 5, 6, 7])
+    body = ''.join(rng.choice(ALPHABET + "ab") for _ in range(length))
+    return "$" + body + rng.choice(["$", "$$", "", "\r$"])
+
+
+def random_input(rng):
+    parts = []
+    if rng.random() < 0.5:
+        parts.append(random_prefix(rng))
+    sentence = rng.choice(SENTENCES)
+    for _ in range(rng.randint(0, 4)):  # corrupt the sentence at random positions
+        position = rng.randint(0, len(sentence))
+        sentence = sentence[:position] + rng.choice(FRAGMENTS) + sentence[position:]
+    parts.append(sentence)
+    for _ in range(rng.randint(0, 2)):
+        parts.insert(rng.randint(0, len(parts)), rng.choice(FRAGMENTS))
+    return ''.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sanitize_nmea_sentence equivalence check")
+    parser.add_argument("--count", type=int, default=300000, help="random inputs to compare")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [random_input(rng) for _ in range(args.count)] + SENTENCES + FRAGMENTS
+    mismatches = []
+    for data in corpus:
+        expected = reference_clean_nmea_data(data)
+        actual = sanitize_nmea_sentence(data)[0]
+        if actual != expected:
+            mismatches.append((data, expected, actual))
+
+    start = time.perf_counter()
+    for data in corpus:
+        reference_clean_nmea_data(data)
+    reference_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in corpus:
+        sanitize_nmea_sentence(data)
+    sanitizer_time = time.perf_counter() - start
+
+    print(f"{len(corpus):,} inputs: {len(mismatches)} mismatches")
+    print(f"former clean_nmea_data: {len(corpus) / reference_time:,.0f} lines/s, "
+          f"sanitize_nmea_sentence: {len(corpus) / sanitizer_time:,.0f} lines/s")
+    for data, expected, actual in mismatches[:10]:
+        print(f"  input {data!r}: expected {expected!r}, got {actual!r}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,10 @@
 # To avoid thread issues with Flask-SocketIO
 from gevent import monkey
 monkey.patch_all()
+import gevent
+import gevent.event
+from gevent.pool import Pool
+from gevent.socket import wait_read
 from gevent.pywsgi import WSGIServer
 import os, sys
 import platform
@@ -15,6 +19,12 @@ import socket
 import serial
 import serial.tools.list_ports
 import threading
+import collections
+import functools
+import math
+import operator
+import struct
+import bisect
 import logging
 import signal
 import atexit
@@ -24,10 +34,11 @@ import datetime
 import ipaddress
 import warnings
 from flask import Flask, Response, render_template, request, redirect, url_for, jsonify
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
 from logging.handlers import RotatingFileHandler
 from dotenv import load_dotenv
+from nmea_traffic_generator import TrafficGenerator
 # import ssl
 
 # Operating system detection
@@ -101,152 +112,187 @@ TCP_TARGET_IP = os.getenv("TCP_TARGET_IP", "")
 TCP_TARGET_PORT = int(os.getenv("TCP_TARGET_PORT", "50110"))
 REJECTED_PATTERN = re.compile(r'^\$([A-Z][A-Z])(GS[A-Z]|XDR|AMAID|AMCLK|AMSA|SGR|MMB|MDA)')
 
-# Global variables for real-time NMEA data
-last_nmea_data = []  # Buffer for latest NMEA data
-max_nmea_buffer = 50  # Keep the last 50 lines
+# Binary capture of every received sentence (segment files + sparse time index, group-commit fsync)
+CAPTURE_ENABLED = os.getenv("CAPTURE_ENABLED", "False").lower() == "true"
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "captures")
+CAPTURE_SEGMENT_MB = min(max(int(os.getenv("CAPTURE_SEGMENT_MB", "64")), 1), 4096)
+CAPTURE_COMMIT_MS = min(max(int(os.getenv("CAPTURE_COMMIT_MS", "1000")), 10), 60000)  # fsync batching interval
+CAPTURE_RETENTION_HOURS = max(float(os.getenv("CAPTURE_RETENTION_HOURS", "168")), 0.0)  # 0 = keep everything
 
-# Variables for rate limiting (avoid server flooding)
-last_emit_time = 0
-emit_counter = 0
-emit_rate_limit = 1000  # Max 1000 messages per second (increased for maritime systems)
+# Recent sentences kept for /api/nmea_history and client catch-up after a reconnection
+NMEA_HISTORY_SIZE = min(max(int(os.getenv("NMEA_HISTORY_SIZE", "1000")), 50), 1000000)
 
-# === MARINETRAFFIC !AIVDx UDP FORWARDER ===
-MARINETRAFFIC_IP = os.getenv("MARINETRAFFIC_IP", "127.0.0.1")
-MARINETRAFFIC_PORT = int(os.getenv("MARINETRAFFIC_PORT", "12345"))
-MARINETRAFFIC_ID = os.getenv("MARINETRAFFIC_ID", None)
+# Replay of a recording (capture directory or nmea_data.log) through the live pipeline at startup
+REPLAY_SOURCE = os.getenv("REPLAY_SOURCE", "")  # e.g. "captures" or "logs/nmea_data.log"; empty = off
+REPLAY_SPEED = max(float(os.getenv("REPLAY_SPEED", "1")), 0.0)  # 1 = real time, 10 = 10x, 0 = as fast as possible
+REPLAY_START = os.getenv("REPLAY_START", "")  # ISO 8601 or epoch seconds; empty = beginning
+REPLAY_END = os.getenv("REPLAY_END", "")
+REPLAY_LOOP = os.getenv("REPLAY_LOOP", "False").lower() == "true"
 
-def send_ais_to_marine_traffic(ais_sentence):
-    """Send !AIVDx sentences to MarineTraffic server."""
-    if not MARINETRAFFIC_ID:
-        return
-    try:
-        # MarineTraffic expects: $AIVDO,xxxxxxxxxxx,day/month/year hh:mm:ss\r\n
-        if not ais_sentence.startswith("!AIVD"):
-            return
+# Synthetic AIS + own-ship traffic (load testing, see nmea_traffic_generator.py)
+SYNTHETIC_TRAFFIC = os.getenv("SYNTHETIC_TRAFFIC", "False").lower() == "true"
+SYNTHETIC_VESSELS = min(max(int(os.getenv("SYNTHETIC_VESSELS", "50")), 0), 100000)
+SYNTHETIC_RATE = max(float(os.getenv("SYNTHETIC_RATE", "0")), 0.0)  # AIS sentences/s, 0 = real reporting intervals
 
-        # Get current date and time in required format
-        now = datetime.datetime.now()
-        date_str = now.strftime("%d/%m/%Y %H:%M:%S")
+# Rate limiting (avoid server flooding): token buckets per source and per output/sentence type
+# Rates are messages per second, 0 = unlimited. Per-source: "SOURCE=rate" where SOURCE is
+# UDP, TCP, SERIAL or a full tag such as "TCP:192.168.1.5:40000".
+RATE_LIMIT_SOURCE_DEFAULT = max(float(os.getenv("RATE_LIMIT_SOURCE_DEFAULT", "1000")), 0.0)
+RATE_LIMIT_SOURCES = os.getenv("RATE_LIMIT_SOURCES", "")
+# Per-output limits: "TYPE=rate" where TYPE is a sentence type (GGA), talker+type (GPGGA) or * (everything else)
+RATE_LIMIT_WEB = os.getenv("RATE_LIMIT_WEB", "")  # web interface, e.g. "GGA=1,RMC=1"
+RATE_LIMIT_WINDY = os.getenv("RATE_LIMIT_WINDY", "")  # Windy plugin ('nmea_data' event)
+RATE_LIMIT_TCP_OUTPUT = os.getenv("RATE_LIMIT_TCP_OUTPUT", "")
+RATE_LIMIT_UDP_OUTPUT = os.getenv("RATE_LIMIT_UDP_OUTPUT", "")
 
-        # Compose message: !AIVDO,1,1,,A,xxxxxxxxxxx,0*xx,day/month/year hh:mm:ss\r\n
-        msg = f"{ais_sentence},{date_str}\r\n"
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.sendto(msg.encode("ascii", errors="ignore"), (MARINETRAFFIC_IP, MARINETRAFFIC_PORT))
-        sock.close()
-        network_logger.info(f"Sent !AIVDx to MarineTraffic: {msg.strip()}")
-    except Exception as e:
-        error_logger.error(f"Failed to send $AIVDO to MarineTraffic: {e}")
+# SocketIO emit dispatcher: one bounded queue drained by long-lived emitter workers
+EMIT_QUEUE_SIZE = int(os.getenv("EMIT_QUEUE_SIZE", "2000"))
+EMIT_WORKERS = int(os.getenv("EMIT_WORKERS", "2"))
+EMIT_OVERFLOW_POLICY = os.getenv("EMIT_OVERFLOW_POLICY", "drop_oldest").strip().lower()  # drop_oldest, drop_newest or block
+
+# Opt-in batching: web clients receive one 'nmea_batch' event per time window
+SOCKETIO_BATCH_MODE = os.getenv("SOCKETIO_BATCH_MODE", "False").lower() == "true"
+SOCKETIO_BATCH_WINDOW_MS = min(max(int(os.getenv("SOCKETIO_BATCH_WINDOW_MS", "100")), 10), 1000)
+SOCKETIO_BATCH_MAX = max(int(os.getenv("SOCKETIO_BATCH_MAX", "200")), 1)
+
+# Sentences with a wrong *hh checksum are always dropped; this also drops sentences without one
+NMEA_REQUIRE_CHECKSUM = os.getenv("NMEA_REQUIRE_CHECKSUM", "False").lower() == "true"
+
+# Output profiles: which sentence types each output receives, and at what maximum rate.
+# Built-in profiles: all, ais, position (own ship at 1 Hz), navigation (everything but AIS).
+# OUTPUT_PROFILES adds or overrides profiles: "name=TYPE[:rate]|TYPE[:rate];name=..."
+OUTPUT_PROFILES = os.getenv("OUTPUT_PROFILES", "")
+OUTPUT_PROFILE_WINDY = os.getenv("OUTPUT_PROFILE_WINDY", "position")
+OUTPUT_PROFILE_WEB = os.getenv("OUTPUT_PROFILE_WEB", "all")
+OUTPUT_PROFILE_TCP = os.getenv("OUTPUT_PROFILE_TCP", "all")
+OUTPUT_PROFILE_UDP = os.getenv("OUTPUT_PROFILE_UDP", "all")
+OUTPUT_PROFILE_FORWARD = os.getenv("OUTPUT_PROFILE_FORWARD", "ais")
+
+# Cross-source duplicate suppression: identical sentences from another source within the window are dropped
+NMEA_DEDUP = os.getenv("NMEA_DEDUP", "True").lower() == "true"
+NMEA_DEDUP_WINDOW_MS = max(int(os.getenv("NMEA_DEDUP_WINDOW_MS", "1000")), 1)
+NMEA_DEDUP_RING = max(int(os.getenv("NMEA_DEDUP_RING", "4096")), 64)  # sentences remembered
+
+# Vessel table: changed vessels are pushed to web clients once per tick
+VESSEL_TICK_MS = min(max(int(os.getenv("VESSEL_TICK_MS", "1000")), 100), 10000)
+
+# Stale-vessel expiry (seconds without a message), per AIS navigational status
+# VESSEL_EXPIRY_BY_STATUS: "status:seconds" pairs, e.g. 1 = at anchor, 5 = moored, 6 = aground
+VESSEL_EXPIRY_DEFAULT = max(int(os.getenv("VESSEL_EXPIRY_DEFAULT", "360")), 10)
+VESSEL_EXPIRY_BY_STATUS = os.getenv("VESSEL_EXPIRY_BY_STATUS", "1:1800,5:1800,6:1800")
+
+# Spatial index over vessel positions (grid cell size in degrees, ~6 NM at 0.1)
+VESSEL_GRID_CELL_DEG = min(max(float(os.getenv("VESSEL_GRID_CELL_DEG", "0.1")), 0.01), 10.0)
+
+# Viewport subscriptions: margin added around each client's map bounds (fraction of the span)
+VIEWPORT_MARGIN = min(max(float(os.getenv("VIEWPORT_MARGIN", "0.25")), 0.0), 2.0)
+
+# TCP ingest server (TCP_MODE=server): simultaneous producers and idle timeout in seconds (0 = never)
+TCP_MAX_CONNECTIONS = max(int(os.getenv("TCP_MAX_CONNECTIONS", "16")), 1)
+TCP_IDLE_TIMEOUT = max(float(os.getenv("TCP_IDLE_TIMEOUT", "300")), 0.0)
+
+# NMEA TCP output (fan-out to OpenCPN / SignalK / plotters, port 10110 style)
+NMEA_TCP_OUTPUT = os.getenv("NMEA_TCP_OUTPUT", "False").lower() == "true"
+NMEA_TCP_OUTPUT_PORT = int(os.getenv("NMEA_TCP_OUTPUT_PORT", "10110"))
+NMEA_TCP_OUTPUT_MAX_CLIENTS = max(int(os.getenv("NMEA_TCP_OUTPUT_MAX_CLIENTS", "64")), 1)
+NMEA_TCP_OUTPUT_BUFFER = max(int(os.getenv("NMEA_TCP_OUTPUT_BUFFER", "1000")), 10)  # sentences queued per client
+# Optional per-client sentence-type filters: "ip=TYPE|TYPE,ip=TYPE" (e.g. "192.168.1.20=GGA|RMC|VDM")
+NMEA_TCP_OUTPUT_FILTERS = os.getenv("NMEA_TCP_OUTPUT_FILTERS", "")
+
+# NMEA UDP output: several sentences packed per datagram (unicast, broadcast or multicast targets)
+NMEA_UDP_OUTPUT = os.getenv("NMEA_UDP_OUTPUT", "False").lower() == "true"
+NMEA_UDP_OUTPUT_TARGETS = os.getenv("NMEA_UDP_OUTPUT_TARGETS", "")  # "ip:port,ip:port"; default UDP_TARGET_IP:UDP_TARGET_PORT
+NMEA_UDP_OUTPUT_MTU = min(max(int(os.getenv("NMEA_UDP_OUTPUT_MTU", "1400")), 100), 65507)
+NMEA_UDP_OUTPUT_FLUSH_MS = min(max(int(os.getenv("NMEA_UDP_OUTPUT_FLUSH_MS", "50")), 1), 1000)
+NMEA_UDP_OUTPUT_TTL = min(max(int(os.getenv("NMEA_UDP_OUTPUT_TTL", "1")), 1), 255)  # multicast hops
+
+# === AIS AGGREGATOR FORWARDING (MarineTraffic, AISHub, ...) ===
+MARINETRAFFIC_IP = os.getenv("MARINETRAFFIC_IP", "127.0.0.1")
+MARINETRAFFIC_PORT = int(os.getenv("MARINETRAFFIC_PORT", "12345"))
+MARINETRAFFIC_ID = os.getenv("MARINETRAFFIC_ID", None)
+# Additional aggregators receiving raw !AIVDx sentences over UDP: "name=ip:port,name=ip:port"
+AIS_FORWARD_DESTINATIONS = os.getenv("AIS_FORWARD_DESTINATIONS", "")
+AIS_FORWARD_RATE = max(float(os.getenv("AIS_FORWARD_RATE", "0")), 0.0)  # sentences/s per destination, 0 = unlimited
+AIS_FORWARD_QUEUE = max(int(os.getenv("AIS_FORWARD_QUEUE", "1000")), 10)
+AIS_FORWARD_DEDUP_SECONDS = max(float(os.getenv("AIS_FORWARD_DEDUP_SECONDS", "10")), 0.0)
 
 # === NMEA DATA EMISSION FUNCTION ===
 # Emit NMEA data via WebSocket and store it in buffer
 
-def emit_nmea_data(source, message):
+def emit_nmea_data(source, message, received_at=None, talker=None, sentence_type=None):
     """Emits NMEA data via WebSocket and stores it"""
-    global last_nmea_data, last_emit_time, emit_counter
-    
     try:
-        # Rate limiting to avoid server flooding
-        current_time = time.time()
-        if current_time - last_emit_time >= 1.0:
-            # Reset counter every second
-            last_emit_time = current_time
-            emit_counter = 0
-        
-        emit_counter += 1
-        if emit_counter > emit_rate_limit:
-            # Skip emission if rate limit exceeded
-            debug_logger.debug(f"Rate limit exceeded, skipping {source}: {message[:30]}...")
-            return
-        
         # Input parameter validation
         if source is None or source == "":
             source = "UNKNOWN"
         if message is None or message == "":
             debug_logger.debug("Empty NMEA message - ignored")
             return
+
+        # Record everything received, before any filtering (incident replay)
+        if capture_store is not None and not source.startswith("REPLAY"):
+            capture_store.append(source, message, received_at)
+
+        # Per-source rate limit: a flooding feed cannot starve the other inputs
+        if not rate_limiter.allow_source(source):
+            return
             
         # Clean the message
         message = str(message).strip()
         if not message or message == "undefined":
             debug_logger.debug(f"Invalid message ignored: '{message}'")
             return
-        
+
+        # Checksum validation + single field split (invalid sentences are counted, not emitted)
+        record = nmea_parser.parse(source, message, received_at, talker, sentence_type)
+        if record is None:
+            return
+
+        # Same sentence already received from another source (redundant feeds)
+        if NMEA_DEDUP and nmea_dedup.is_duplicate(record):
+            return
+
+        # Server-side AIS decoding (fragments are reassembled by sequence ID),
+        # merged into the vessel table; clients get it in the next 'vessel_delta'
+        if record.sentence_type in AIS_SENTENCE_TYPES:
+            vessel = ais_decoder.feed(record)
+            if vessel is not None:
+                vessel_table.update(vessel, source, record.received_at)
 
         # Add timestamp
         timestamp = time.strftime("%H:%M:%S")
-        formatted_message = f"[{timestamp}][{source}] {message}"
 
-        # Add to buffer
-        last_nmea_data.append(formatted_message)
-        if len(last_nmea_data) > max_nmea_buffer:
-            last_nmea_data.pop(0)
+        # Sequenced history (catch-up for reconnecting clients, /api/nmea_history)
+        seq = nmea_history.append(record, timestamp)
 
         # LOG NMEA to file instead of console
         # nmea_logger.info(f"{source}: {message}")
 
-        # Forward !AIVDO sentences to MarineTraffic
-        if message.startswith("!AIVD"):
-            send_ais_to_marine_traffic(message)
+        # Outputs that take this sentence under their profile and rate (one table lookup)
+        routes = output_router.route(record)
+        if not routes:
+            return
+
+        # Republish to downstream navigation software (TCP fan-out, UDP datagrams)
+        if 'tcp' in routes and nmea_tcp_output.clients:
+            nmea_tcp_output.publish(record)
+        if 'udp' in routes and nmea_udp_output is not None:
+            nmea_udp_output.publish(record)
+
+        # Forward to the AIS aggregators (queued, never blocks)
+        if 'forward' in routes and ais_forwarder.destinations:
+            ais_forwarder.submit(record)
 
         # DEBUG only if enabled AND in verbose mode
         # if DEBUG:
         #     debug_logger.debug(f"EMIT {source}: {message[:50]}...")
 
-        # Emit for Windy Plugin (pure NMEA string) - NON-BLOCKING with circuit breaker
-        try:
-            # Only emit if we have connected clients and circuit breaker allows it
-            if connected_clients and socketio_circuit_breaker.can_emit():
-                # Use threading with timeout to prevent hanging
-                def emit_windy():
-                    try:
-                        # Remove timeout parameter that causes errors
-                        socketio.emit('nmea_data', message)
-                        socketio_circuit_breaker.record_success()
-                    except Exception as emit_error:
-                        socketio_circuit_breaker.record_failure()
-                        # Log only in debug mode to prevent spam
-                        if DEBUG:
-                            debug_logger.debug(f"SocketIO emit error: {emit_error}")
-                        pass  # Silent fail to prevent server freeze
-                
-                # Run emission in background thread with daemon=True and timeout
-                import threading
-                emit_thread = threading.Thread(target=emit_windy, daemon=True)
-                emit_thread.start()
-                # Don't wait for thread - let it run in background
-            
-        except Exception as windy_error:
-            socketio_circuit_breaker.record_failure()
-            # Only log errors in debug mode to prevent log spam
-            if DEBUG:
-                error_logger.error(f"Windy emission error: {windy_error}")
-
-        # Emit for web interface with source information - NON-BLOCKING with circuit breaker
-        try:
-            # Only emit if we have connected clients and circuit breaker allows it
-            if connected_clients and socketio_circuit_breaker.can_emit():
-                web_data = {
-                    'source': source,
-                    'message': message,
-                    'timestamp': datetime.datetime.now().strftime('%H:%M:%S')
-                }
-                
-                def emit_web():
-                    try:
-                        socketio.emit('nmea_data_web', web_data)
-                        socketio_circuit_breaker.record_success()
-                    except Exception as web_emit_error:
-                        socketio_circuit_breaker.record_failure()
-                        if DEBUG:
-                            debug_logger.debug(f"Web emit error: {web_emit_error}")
-                        pass  # Silent fail to prevent server freeze
-                
-                # Run emission in background thread with daemon=True
-                threading.Thread(target=emit_web, daemon=True).start()
-        except Exception as ws_error:
-            # Only log errors in debug mode to prevent log spam
-            if DEBUG:
-                error_logger.error(f"WebSocket emission error: {ws_error}")
+        # Hand over to the emitter workers (Windy + web interface) - NON-BLOCKING
+        # The dispatcher applies the configured overflow policy when the queue is full
+        windy = 'windy' in routes
+        web = 'web' in routes
+        if (windy or web) and connected_clients and socketio_circuit_breaker.can_emit():
+            emit_dispatcher.submit((seq, record, timestamp, windy, web))
 
     except Exception as e:
         error_logger.error(f"Error during NMEA emission: {e}")
@@ -267,6 +313,16 @@ def get_resource_path(relative_path):
 DEFAULT_SERIAL_PORT = "COM5" if IS_WINDOWS else "AUTO"
 SERIAL_PORT = os.getenv("SERIAL_PORT", DEFAULT_SERIAL_PORT).strip()
 SERIAL_BAUDRATE = int(os.getenv("SERIAL_BAUDRATE", 4800))
+# "event": block until the port is readable (os.readv on POSIX, worker thread elsewhere),
+# "thread": always read on a worker thread, "poll": legacy in_waiting loop
+SERIAL_READ_MODE = os.getenv("SERIAL_READ_MODE", "event").strip().lower()
+# Additional serial/USB inputs next to SERIAL_PORT: "NAME=port@baud,..." (each tagged SERIAL:NAME)
+SERIAL_SOURCES = os.getenv("SERIAL_SOURCES", "").strip()
+# Baud-rate probe when a port is opened for the first time: the configured rate is tried first,
+# then the candidates; each gets up to SERIAL_AUTOBAUD_WINDOW_MS and is scored by valid-checksum sentences
+SERIAL_AUTOBAUD = os.getenv("SERIAL_AUTOBAUD", "True").lower() == "true"
+SERIAL_AUTOBAUD_RATES = os.getenv("SERIAL_AUTOBAUD_RATES", "4800,38400,9600,115200,19200,57600")
+SERIAL_AUTOBAUD_WINDOW_MS = min(max(int(os.getenv("SERIAL_AUTOBAUD_WINDOW_MS", "1200")), 200), 5000)
 ENABLE_SERIAL = os.getenv("ENABLE_SERIAL", "True").lower() == "true"
 ENABLE_UDP = os.getenv("ENABLE_UDP", "True").lower() == "true"
 ENABLE_TCP = os.getenv("ENABLE_TCP", "True").lower() == "true"
@@ -509,10 +565,8 @@ def signal_handler(signum, frame):
         main_logger.info("Stopping HTTP server...")
         http_server.stop()
     
-    # Stop all threads
-    serial_stop.set()
-    udp_stop.set()
-    tcp_stop.set()
+    # Stop all ingest sources (cancels their pending reads)
+    ingest_engine.stop_all(block=False)
     bluetooth_monitor_stop.set()
     
     main_logger.info("Shutdown complete")
@@ -522,9 +576,10 @@ def cleanup_on_exit():
     """Cleanup function called on normal exit"""
     if not shutdown_event.is_set():
         shutdown_event.set()
-        serial_stop.set()
-        udp_stop.set()
-        tcp_stop.set()
+        try:
+            ingest_engine.stop_all(block=False)
+        except NameError:
+            pass  # ingest_engine not defined yet
         bluetooth_monitor_stop.set()
         
         # Stop the new daemon threads to prevent hanging
@@ -537,6 +592,18 @@ def cleanup_on_exit():
             cleanup_stop.set()
         except NameError:
             pass  # cleanup_stop not defined yet
+
+        try:
+            emit_dispatcher.stop()
+            vessel_table.stop()
+            nmea_tcp_output.stop()
+            ais_forwarder.stop()
+            if nmea_udp_output is not None:
+                nmea_udp_output.stop()
+            if capture_store is not None:
+                capture_store.stop()
+        except NameError:
+            pass  # emit_dispatcher not defined yet
             
         main_logger.info("Cleanup completed")
 
@@ -617,13 +684,12 @@ def list_serial_ports():
     
         
 # === FLAGS AND THREADS FOR DYNAMIC MANAGEMENT ===
-serial_thread = None
+# serial/udp/tcp handles are IngestSource objects (greenlets owned by the ingest engine)
+serial_threads = {}  # source tag ("SERIAL", "SERIAL:AIS", ...) -> IngestSource
+serial_detected_baudrates = {}  # port -> baud rate locked in by the auto-baud probe
 udp_thread = None
 tcp_thread = None
 bluetooth_monitor_thread = None
-serial_stop = threading.Event()
-udp_stop = threading.Event()
-tcp_stop = threading.Event()
 bluetooth_monitor_stop = threading.Event()
 
 # Stop events for daemon threads to prevent hanging
@@ -635,25 +701,1485 @@ cleanup_stop = threading.Event()
 # It is designed to handle various NMEA formats and ensure clean data for processing.
 # It removes common repeater prefixes, cleans up double dollar signs, and strips control characters.
 # It is used to ensure that only valid NMEA sentences are processed and emitted.
+
+# Precompiled sanitizer patterns (compiled once instead of on every line)
+REPEATER_PREFIX_PATTERN = re.compile(r'^\$[A-Z0-9]{2,6}\$')
+MULTIPLE_DOLLAR_PATTERN = re.compile(r'\$\$+')
+# str.translate deletion table for [\r\n\x00-\x1F]
+CONTROL_CHARS_TABLE = dict.fromkeys(range(0x20))
+
+def sanitize_nmea_sentence(data):
+    """
+    Clean one NMEA line and identify it in a single call.
+    Returns (sentence, talker, sentence_type); talker/type are "" when the
+    line is not an NMEA/AIS sentence. The sentence is identical to what the
+    former three re.sub() calls produced: the steps run in the same order
+    but are skipped entirely for lines that do not need them.
+    """
+    # Remove common repeater prefixes ($XX$, $ABCD$, ...)
+    if data[:1] == '$' and '$' in data[3:8]:
+        data = REPEATER_PREFIX_PATTERN.sub('$', data, count=1)
+
+    # Clean double $
+    if '$$' in data:
+        data = MULTIPLE_DOLLAR_PATTERN.sub('$', data)
+
+    # Remove control characters (isprintable() is False whenever one is present)
+    if not data.isprintable():
+        data = data.translate(CONTROL_CHARS_TABLE)
+
+    data = data.strip()
+
+    # Address field: $GPGGA -> ("GP", "GGA"), !AIVDM -> ("AI", "VDM"), $PGRMZ -> ("P", "GRMZ")
+    talker = sentence_type = ""
+    if data[:1] in ('$', '!'):
+        end = data.find(',')
+        address = data[1:end] if end > 0 else data[1:].split('*', 1)[0]
+        if address[:1] == 'P':
+            talker, sentence_type = 'P', address[1:]
+        elif len(address) > 2:
+            talker, sentence_type = address[:2], address[2:]
+
+    return data, talker, sentence_type
+
 def clean_nmea_data(data):
     """Clean NMEA data from repeater prefixes"""
-    import re
-    
-    # Remove common repeater prefixes
-    data = re.sub(r'^\$[A-Z0-9]{2,6}\$', '$', data)
-    
-    # Clean double $
-    data = re.sub(r'\$+', '$', data)
-    
-    # Remove control characters
-    data = re.sub(r'[\r\n\x00-\x1F]', '', data)
-    
-    return data.strip()
+    return sanitize_nmea_sentence(data)[0]
+
+
+# === NMEA PARSE STAGE ===
+# Every accepted sentence is checksum-validated and split into fields once,
+# here, so downstream consumers (and the browser) don't re-split the raw string.
+NMEARecord = collections.namedtuple(
+    'NMEARecord',
+    ['talker', 'sentence_type', 'fields', 'received_at', 'source', 'raw']
+)
+
+def compute_nmea_checksum(body):
+    """XOR checksum of the characters between '$'/'!' and '*' as a 2-digit hex string"""
+    return f"{functools.reduce(operator.xor, body.encode('ascii', 'ignore'), 0):02X}"
+
+def validate_nmea_checksum(sentence):
+    """True/False for sentences carrying a *hh checksum, None when there is none"""
+    star = sentence.rfind('*')
+    if star < 1 or len(sentence) < star + 3:
+        return None
+    return compute_nmea_checksum(sentence[1:star]) == sentence[star + 1:star + 3].upper()
+
+class NMEAParseStage:
+    """Checksum validation and field splitting, with per-source counters"""
+    def __init__(self, require_checksum=False):
+        self.require_checksum = require_checksum
+        self.lock = threading.Lock()
+        self.stats = {}  # source -> {'parsed', 'invalid_checksum', 'missing_checksum'}
+
+    def _count(self, source, key):
+        with self.lock:
+            counters = self.stats.get(source)
+            if counters is None:
+                counters = self.stats[source] = {'parsed': 0, 'invalid_checksum': 0, 'missing_checksum': 0}
+            counters[key] += 1
+
+    def parse(self, source, sentence, received_at=None, talker=None, sentence_type=None):
+        """Return an NMEARecord, or None if the sentence must not be emitted"""
+        star = sentence.rfind('*')
+        checksum_ok = validate_nmea_checksum(sentence)
+        if checksum_ok is False:
+            self._count(source, 'invalid_checksum')
+            debug_logger.debug(f"Invalid checksum from {source}: {sentence[:60]}")
+            return None
+        if checksum_ok is None:
+            self._count(source, 'missing_checksum')
+            if self.require_checksum:
+                return None
+            star = len(sentence)
+
+        fields = sentence[1:star].split(',')
+        if talker is None:
+            _, talker, sentence_type = sanitize_nmea_sentence(sentence)
+
+        self._count(source, 'parsed')
+        return NMEARecord(
+            talker,
+            sentence_type,
+            tuple(fields[1:]),
+            received_at if received_at is not None else time.time(),
+            source,
+            sentence
+        )
+
+    def merge_source(self, source, into):
+        """Fold a short-lived source's counters into another one (e.g. a closed TCP connection)"""
+        with self.lock:
+            counters = self.stats.pop(source, None)
+            if counters is None:
+                return
+            target = self.stats.setdefault(into, {'parsed': 0, 'invalid_checksum': 0, 'missing_checksum': 0})
+            for key, value in counters.items():
+                target[key] += value
+
+    def get_stats(self):
+        with self.lock:
+            return {source: dict(counters) for source, counters in self.stats.items()}
+
+# Global parse stage instance
+nmea_parser = NMEAParseStage(NMEA_REQUIRE_CHECKSUM)
+
+
+# === CROSS-SOURCE DEDUPLICATION ===
+# The same receiver reachable over UDP and TCP (or two GPS repeating each
+# other) delivers every sentence twice. Recent sentences are kept in a
+# fixed-size hash ring; a copy arriving from a *different* source within the
+# window is suppressed. Repeats from the same source are always kept.
+
+class DuplicateFilter:
+    """Fixed-size ring of recent sentence hashes with per source-pair counters"""
+    MAX_PAIRS = 256  # bound on distinct "first>duplicate" source pairs tracked
+
+    def __init__(self, window=1.0, size=4096):
+        self.window = window
+        self.size = size
+        self.hashes = [None] * size
+        self.times = [0.0] * size
+        self.sources = [None] * size
+        self.index = {}  # hash -> slot
+        self.position = 0
+        self.lock = threading.Lock()
+        self.pairs = {}  # "first>duplicate" -> suppressed count
+        self.stats = {'checked': 0, 'suppressed': 0}
+
+    def is_duplicate(self, record):
+        """True when the same sentence came from another source within the window"""
+        key = hash(record.raw)
+        now = record.received_at
+        with self.lock:
+            self.stats['checked'] += 1
+            slot = self.index.get(key)
+            if slot is not None and now - self.times[slot] <= self.window:
+                first = self.sources[slot]
+                if first != record.source:
+                    self.stats['suppressed'] += 1
+                    pair = f"{first}>{record.source}"
+                    if pair in self.pairs or len(self.pairs) < self.MAX_PAIRS:
+                        self.pairs[pair] = self.pairs.get(pair, 0) + 1
+                    else:
+                        self.pairs['other'] = self.pairs.get('other', 0) + 1
+                    return True
+                # Same source repeating itself: refresh the entry in place
+                self.times[slot] = now
+                return False
+
+            # Overwrite the oldest slot of the ring
+            slot = self.position
+            self.position = (slot + 1) % self.size
+            old = self.hashes[slot]
+            if old is not None and self.index.get(old) == slot:
+                del self.index[old]
+            self.hashes[slot] = key
+            self.times[slot] = now
+            self.sources[slot] = record.source
+            self.index[key] = slot
+            return False
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['pairs'] = dict(self.pairs)
+        stats['enabled'] = NMEA_DEDUP
+        stats['window_ms'] = int(self.window * 1000)
+        stats['ring'] = self.size
+        return stats
+
+# Global duplicate filter
+nmea_dedup = DuplicateFilter(NMEA_DEDUP_WINDOW_MS / 1000.0, NMEA_DEDUP_RING)
+
+
+# === NMEA HISTORY RING ===
+# Fixed-capacity ring of accepted records numbered by a monotonically
+# increasing sequence. Sequence n lives in slot n % capacity, so reading
+# "everything after n" is index arithmetic over the requested range only.
+# Appends happen on the ingest greenlets and never yield, so no lock.
+
+class NMEAHistory:
+    """Sequenced ring buffer of (seq, record, timestamp) entries"""
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.last_seq = 0  # sequence of the newest entry (0 = empty)
+        self.epoch = os.urandom(6).hex()  # server instance id: sequences restart from 1 with every new epoch
+
+    def append(self, record, timestamp):
+        """Store a record and return its sequence number"""
+        seq = self.last_seq + 1
+        self.slots[seq % self.capacity] = (seq, record, timestamp)
+        self.last_seq = seq
+        return seq
+
+    @property
+    def oldest_seq(self):
+        return max(1, self.last_seq - self.capacity + 1) if self.last_seq else 0
+
+    def since(self, seq, limit=None):
+        """Entries after `seq`, oldest first, at most `limit`; gap is True when some were overwritten"""
+        last = self.last_seq
+        start = max(seq + 1, self.oldest_seq, 1)
+        # Missed entries were overwritten, or the client is ahead (server restarted: sequences reset)
+        gap = (seq + 1 < start and seq < last) or seq > last
+        if limit is not None:
+            last = min(last, start + limit - 1)
+        slots, capacity = self.slots, self.capacity
+        return [slots[n % capacity] for n in range(start, last + 1)], gap
+
+    def latest(self, limit):
+        """The newest `limit` entries, oldest first"""
+        return self.since(max(0, self.last_seq - limit), limit)[0]
+
+    @staticmethod
+    def to_dict(entry):
+        seq, record, timestamp = entry
+        return {
+            'seq': seq,
+            'source': record.source,
+            'message': record.raw,
+            'type': record.sentence_type,
+            'fields': record.fields,
+            'timestamp': timestamp,
+            'received_at': record.received_at
+        }
+
+    def get_stats(self):
+        return {'capacity': self.capacity, 'last_seq': self.last_seq, 'oldest_seq': self.oldest_seq,
+                'buffered': min(self.last_seq, self.capacity), 'epoch': self.epoch}
+
+# Global history ring
+nmea_history = NMEAHistory(NMEA_HISTORY_SIZE)
+
+
+# === CAPTURE STORE ===
+# Append-only binary capture of every received sentence. A segment file
+# starts with CAPTURE_SEGMENT_MAGIC followed by records:
+#   u16 raw length | i64 receive time (ns) | u8 source length | source | raw
+# (little endian). Each segment has a sidecar .idx of (time ns, offset)
+# pairs, one per 64 KiB of records, used to seek by time. The ingest path
+# only appends to an in-memory batch; a committer greenlet writes and fsyncs
+# the batch on the hub's thread pool every CAPTURE_COMMIT_MS (group commit).
+# A crash loses at most the last batch; a torn last record is ignored on read.
+
+CAPTURE_SEGMENT_MAGIC = b"NMEACAP\x01"
+CAPTURE_INDEX_MAGIC = b"NMEAIDX\x01"
+CAPTURE_RECORD = struct.Struct("<HqB")
+CAPTURE_INDEX_ENTRY = struct.Struct("<qQ")
+CAPTURE_INDEX_STRIDE = 64 * 1024  # bytes of records between two index entries
+CAPTURE_MAX_PENDING = 64 * 1024 * 1024  # uncommitted bytes before records are dropped (stalled disk)
+
+class CaptureWriter:
+    """Append-only segmented capture with a sparse time index and group-commit fsync"""
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, commit_interval=1.0, retention_hours=168.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self.retention = retention_hours * 3600.0
+        self.batches = collections.deque()  # [stem, records, index entries, closes segment]
+        self.current = None  # batch receiving appends
+        self.stem = None  # current segment name (without extension)
+        self.offset = 0  # offset of the next record in the current segment
+        self.next_index = 0  # offset from which the next index entry is due
+        self.last_ts = 0  # highest receive time seen (keeps the index monotonic)
+        self.pending = 0
+        self.files = None  # (stem, segment file, index file), used by the committer only
+        self.commit_lock = threading.Lock()
+        self.wakeup = gevent.event.Event()
+        self.greenlet = None
+        self.stats = {'records': 0, 'bytes': 0, 'segments': 0, 'commits': 0, 'dropped': 0,
+                      'errors': 0, 'last_commit_ms': 0.0}
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self.greenlet is None or self.greenlet.dead:
+            self.greenlet = gevent.spawn(self._commit_loop)
+        main_logger.info(f"[CAPTURE] Recording to {os.path.abspath(self.directory)} "
+                         f"({self.segment_bytes // (1024 * 1024)} MB segments, commit every {int(self.commit_interval * 1000)} ms)")
+
+    def stop(self):
+        """Stop the committer and write what is left synchronously"""
+        if self.greenlet is not None:
+            self.greenlet.kill(block=False)
+        self._seal()
+        with self.commit_lock:
+            batches, self.batches, self.current = self.batches, collections.deque(), None
+            self.pending -= self._write(batches)
+            self._close_files()
+
+    def append(self, source, raw, received_at=None):
+        """Queue one received sentence (never blocks)"""
+        if self.pending > CAPTURE_MAX_PENDING:
+            self.stats['dropped'] += 1
+            return
+        ts = time.time_ns() if received_at is None else int(received_at * 1e9)
+        src = source.encode('utf-8', 'ignore')[:255]
+        data = raw.encode('ascii', 'ignore')[:65535]
+
+        batch = self.current
+        if batch is None:
+            if self.stem is None:
+                # New segment, named after its first receive time
+                self.stem = f"capture-{ts}"
+                self.offset = self.next_index = len(CAPTURE_SEGMENT_MAGIC)
+                self.stats['segments'] += 1
+            batch = self.current = [self.stem, bytearray(), bytearray(), False]
+            self.batches.append(batch)
+
+        if ts > self.last_ts:
+            self.last_ts = ts
+        if self.offset >= self.next_index:
+            batch[2] += CAPTURE_INDEX_ENTRY.pack(self.last_ts, self.offset)
+            self.next_index = self.offset + CAPTURE_INDEX_STRIDE
+
+        size = CAPTURE_RECORD.size + len(src) + len(data)
+        batch[1] += CAPTURE_RECORD.pack(len(data), ts, len(src))
+        batch[1] += src
+        batch[1] += data
+        self.offset += size
+        self.pending += size
+        self.stats['records'] += 1
+        self.stats['bytes'] += size
+
+        if self.offset >= self.segment_bytes:
+            self._seal()
+            self.wakeup.set()
+
+    def _seal(self):
+        """Close the current segment: the next append starts a new one"""
+        if self.current is not None:
+            self.current[3] = True
+        self.current = None
+        self.stem = None
+
+    def commit(self):
+        """Write and fsync everything appended so far (on the hub's thread pool)"""
+        with self.commit_lock:
+            batches, self.batches, self.current = self.batches, collections.deque(), None
+            if not batches:
+                return
+            started = time.perf_counter()
+            written = gevent.get_hub().threadpool.apply(self._write, (batches,))
+            self.pending -= written
+            self.stats['commits'] += 1
+            self.stats['last_commit_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    def _commit_loop(self):
+        while True:
+            self.wakeup.wait(self.commit_interval)
+            self.wakeup.clear()
+            try:
+                self.commit()
+            except Exception as e:
+                self.stats['errors'] += 1
+                error_logger.error(f"[CAPTURE] Commit error: {e}")
+                gevent.sleep(self.commit_interval)
+
+    def _write(self, batches):
+        """Committer: append the batches to their segment/index files, fsync, close sealed segments"""
+        written = 0
+        for stem, records, index, closes in batches:
+            if self.files is None or self.files[0] != stem:
+                self._close_files()
+                self.files = (stem,
+                              self._open(os.path.join(self.directory, stem + ".nmeacap"), CAPTURE_SEGMENT_MAGIC),
+                              self._open(os.path.join(self.directory, stem + ".idx"), CAPTURE_INDEX_MAGIC))
+            _, segment, index_file = self.files
+            segment.write(records)
+            index_file.write(index)
+            segment.flush()
+            index_file.flush()
+            os.fsync(segment.fileno())
+            os.fsync(index_file.fileno())
+            written += len(records)
+            if closes:
+                self._close_files()
+                self._expire_segments()
+        return written
+
+    @staticmethod
+    def _open(path, magic):
+        f = open(path, 'ab')
+        if f.tell() == 0:
+            f.write(magic)
+        return f
+
+    def _close_files(self):
+        if self.files is not None:
+            for f in self.files[1:]:
+                try:
+                    f.close()
+                except OSError:
+                    pass
+            self.files = None
+
+    def _expire_segments(self):
+        """Retention: delete segments last written more than CAPTURE_RETENTION_HOURS ago"""
+        if not self.retention:
+            return
+        limit = time.time() - self.retention
+        for name in os.listdir(self.directory):
+            if name.endswith(".nmeacap"):
+                path = os.path.join(self.directory, name)
+                try:
+                    if os.path.getmtime(path) < limit:
+                        os.remove(path)
+                        idx = path[:-len(".nmeacap")] + ".idx"
+                        if os.path.exists(idx):
+                            os.remove(idx)
+                except OSError as e:
+                    error_logger.error(f"[CAPTURE] Cannot remove expired segment {name}: {e}")
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['pending_bytes'] = self.pending
+        stats['segment'] = self.stem
+        stats['directory'] = self.directory
+        return stats
+
+class CaptureReader:
+    """Reads capture segments in time order; start times are located with the sparse index"""
+    CHUNK = 1024 * 1024
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def segments(self):
+        """[(first receive time ns, path)] sorted by time"""
+        segments = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return segments
+        for name in names:
+            if name.startswith("capture-") and name.endswith(".nmeacap"):
+                try:
+                    segments.append((int(name[len("capture-"):-len(".nmeacap")]), os.path.join(self.directory, name)))
+                except ValueError:
+                    continue
+        segments.sort()
+        return segments
+
+    def seek_offset(self, path, start_ns):
+        """Offset of the last indexed record at or before start_ns (segment start without an index)"""
+        offset = len(CAPTURE_SEGMENT_MAGIC)
+        try:
+            with open(path[:-len(".nmeacap")] + ".idx", 'rb') as f:
+                data = f.read()
+        except OSError:
+            return offset
+        if not data.startswith(CAPTURE_INDEX_MAGIC):
+            return offset
+        body = memoryview(data)[len(CAPTURE_INDEX_MAGIC):]
+        count = len(body) // CAPTURE_INDEX_ENTRY.size
+        times = [CAPTURE_INDEX_ENTRY.unpack_from(body, i * CAPTURE_INDEX_ENTRY.size)[0] for i in range(count)]
+        position = bisect.bisect_right(times, start_ns) - 1
+        if position >= 0:
+            offset = CAPTURE_INDEX_ENTRY.unpack_from(body, position * CAPTURE_INDEX_ENTRY.size)[1]
+        return offset
+
+    def read(self, start_ns=None, end_ns=None):
+        """Yield (receive time ns, source, raw sentence) between start_ns and end_ns"""
+        segments = self.segments()
+        first = 0
+        if start_ns is not None:
+            for i, (first_ts, _) in enumerate(segments):
+                if first_ts <= start_ns:
+                    first = i
+        for first_ts, path in segments[first:]:
+            if end_ns is not None and first_ts > end_ns:
+                return
+            offset = self.seek_offset(path, start_ns) if start_ns is not None else len(CAPTURE_SEGMENT_MAGIC)
+            for ts, source, raw in self._read_segment(path, offset):
+                if start_ns is not None and ts < start_ns:
+                    continue
+                if end_ns is not None and ts > end_ns:
+                    return
+                yield ts, source, raw
+
+    def _read_segment(self, path, offset):
+        header = CAPTURE_RECORD.size
+        with open(path, 'rb') as f:
+            if f.read(len(CAPTURE_SEGMENT_MAGIC)) != CAPTURE_SEGMENT_MAGIC:
+                main_logger.warning(f"[CAPTURE] Not a capture segment: {path}")
+                return
+            f.seek(offset)
+            buf = b''
+            while True:
+                chunk = f.read(self.CHUNK)
+                if not chunk:
+                    return  # a torn record at the end is ignored
+                buf = buf + chunk if buf else chunk
+                view = memoryview(buf)
+                pos, end = 0, len(buf)
+                while end - pos >= header:
+                    length, ts, src_len = CAPTURE_RECORD.unpack_from(view, pos)
+                    size = header + src_len + length
+                    if end - pos < size:
+                        break
+                    start = pos + header
+                    yield ts, str(view[start:start + src_len], 'utf-8', 'ignore'), str(view[start + src_len:pos + size], 'ascii')
+                    pos += size
+                buf = bytes(view[pos:])
+                view.release()
+
+# Global capture writer (created in main_thread() when CAPTURE_ENABLED is on)
+capture_store = None
+
+
+# === REPLAY ENGINE ===
+# Plays a recording back through the live pipeline: the binary capture store
+# (a CAPTURE_DIR directory) or the nmea_data.log text log with its rotated
+# files. Sentences are paced on their recorded receive times (real time,
+# N x speed, or as fast as possible with speed 0) and enter through
+# ingest_lines() tagged "REPLAY:<original source>", so rate limits, dedup,
+# routing and the web layer see them like live traffic. Replayed sentences
+# are not written back to the capture store.
+
+# nmea_data.log line: "2026-10-17 23:20:36,112 - INFO - [UDP] !AIVDM,..."
+NMEA_LOG_LINE = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) - [A-Z]+ - \[([^\]]*)\] (\S+)')
+
+def nmea_log_files(path):
+    """nmea_data.log and its rotated backups, oldest first (.5 ... .1, then the live file)"""
+    backups = []
+    directory, name = os.path.split(path)
+    try:
+        names = os.listdir(directory or '.')
+    except OSError:
+        names = []
+    for candidate in names:
+        suffix = candidate[len(name) + 1:]
+        if candidate.startswith(name + '.') and suffix.isdigit():
+            backups.append((int(suffix), os.path.join(directory, candidate)))
+    backups.sort(reverse=True)
+    files = [p for _, p in backups]
+    if os.path.isfile(path):
+        files.append(path)
+    return files
+
+def read_nmea_log(path, start_ns=None, end_ns=None):
+    """Yield (receive time ns, source, raw sentence) from the text log between start_ns and end_ns"""
+    last_stamp, last_epoch = None, 0
+    for log_file in nmea_log_files(path):
+        with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                match = NMEA_LOG_LINE.match(line)
+                if match is None:
+                    continue
+                stamp, millis, source, raw = match.groups()
+                if stamp != last_stamp:  # one strptime per second of log
+                    last_stamp = stamp
+                    last_epoch = int(time.mktime(time.strptime(stamp, "%Y-%m-%d %H:%M:%S")))
+                ts = (last_epoch * 1000 + int(millis)) * 1000000
+                if start_ns is not None and ts < start_ns:
+                    continue
+                if end_ns is not None and ts > end_ns:
+                    return
+                yield ts, source, raw
+
+def replay_path_allowed(path):
+    """True for CAPTURE_DIR (or a directory below it) and the nmea_data.log set; other files are never read"""
+    real = os.path.realpath(path)
+    capture_root = os.path.realpath(CAPTURE_DIR)
+    if real == capture_root or real.startswith(capture_root + os.sep):
+        return True
+    text_log = os.path.realpath(nmea_handler.baseFilename)
+    return real == text_log or (real.startswith(text_log + '.') and real[len(text_log) + 1:].isdigit())
+
+def open_recording(path, start_ns=None, end_ns=None):
+    """Records from a capture directory or a text log file"""
+    if os.path.isdir(path):
+        return CaptureReader(path).read(start_ns, end_ns)
+    if not nmea_log_files(path):
+        raise FileNotFoundError(f"No recording at {path}")
+    return read_nmea_log(path, start_ns, end_ns)
+
+def parse_replay_time(value):
+    """Epoch seconds or ISO 8601 date/time (local time if no offset) -> ns; empty -> None"""
+    if value is None or str(value).strip() == "":
+        return None
+    value = str(value).strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = datetime.datetime.fromisoformat(value).timestamp()
+    if not math.isfinite(seconds):
+        raise ValueError(f"Invalid replay time: {value}")
+    return int(seconds * 1e9)
+
+class ReplaySession:
+    """Pushes a recording through ingest_lines() with the recorded inter-arrival times"""
+    YIELD_EVERY = 500  # sentences between hub yields at full speed
+
+    def __init__(self, path, speed=1.0, start_ns=None, end_ns=None, loop=False):
+        self.path = path
+        self.speed = max(float(speed), 0.0)  # 0 = as fast as possible
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.loop = loop
+        self.state = 'created'
+        self.stats = {'records': 0, 'emitted': 0, 'passes': 0, 'max_lag_ms': 0.0,
+                      'first_ts': None, 'position_ts': None, 'started_at': None, 'finished_at': None}
+
+    def run(self):
+        """Ingest source target: play once, or until stopped with loop"""
+        self.state = 'running'
+        self.stats['started_at'] = time.time()
+        main_logger.info(f"[REPLAY] Playing {self.path} at "
+                         f"{'full speed' if not self.speed else f'{self.speed:g}x'}")
+        try:
+            while True:
+                played = self.play(open_recording(self.path, self.start_ns, self.end_ns))
+                self.stats['passes'] += 1
+                if not self.loop or not played:
+                    break
+            self.state = 'finished'
+        except gevent.GreenletExit:
+            self.state = 'stopped'
+            raise
+        except OSError as e:
+            self.state = 'failed'
+            error_logger.error(f"[REPLAY] Cannot read {self.path}: {e}")
+        finally:
+            self.stats['finished_at'] = time.time()
+            main_logger.info(f"[REPLAY] {self.state}: {self.stats['records']} sentences, {self.stats['emitted']} emitted")
+
+    def play(self, records):
+        """One pass over the records; returns how many were played"""
+        stats = self.stats
+        speed = self.speed
+        ingest = ingest_engine.ingest_lines
+        first_ts = None
+        wall_start = time.monotonic()
+        played = 0
+        for ts, source, raw in records:
+            if first_ts is None:
+                first_ts = ts
+                if stats['first_ts'] is None:
+                    stats['first_ts'] = ts / 1e9
+            if speed:
+                delay = wall_start + (ts - first_ts) / 1e9 / speed - time.monotonic()
+                if delay > 0.001:
+                    gevent.sleep(delay)
+                elif -delay * 1000 > stats['max_lag_ms']:
+                    stats['max_lag_ms'] = round(-delay * 1000, 3)
+            if played % self.YIELD_EVERY == 0:
+                gevent.sleep(0)  # a burst never starves the other greenlets
+            stats['emitted'] += ingest("REPLAY:" + source, (raw,), stats_key="REPLAY", received_at=time.time())
+            stats['records'] += 1
+            stats['position_ts'] = ts / 1e9
+            played += 1
+        return played
+
+    def get_stats(self):
+        return dict(self.stats, path=self.path, speed=self.speed, loop=self.loop, state=self.state)
+
+# Current replay (started from REPLAY_SOURCE or /api/replay)
+replay_session = None
+
+def start_replay(path, speed=1.0, start_ns=None, end_ns=None, loop=False):
+    """Start a replay as the "REPLAY" ingest source (replaces a running one)"""
+    global replay_session
+    session = ReplaySession(path, speed, start_ns, end_ns, loop)
+    replay_session = session
+    ingest_engine.start("REPLAY", session.run)
+    return session
+
+def stop_replay():
+    ingest_engine.stop("REPLAY")
+
+def replay_running():
+    source = ingest_engine.sources.get("REPLAY")
+    return source is not None and source.is_alive()
+
+def synthetic_traffic_source(vessels, rate):
+    """Ingest source target: simulated vessels and own ship (source tag SYNTH)"""
+    generator = TrafficGenerator(vessels, rate=rate)
+    main_logger.info(f"[SYNTH] {vessels} simulated vessels, "
+                     f"{rate or generator.natural_rate:.0f} AIS sentences/s + own ship")
+    generator.run(lambda sentences: ingest_engine.ingest_lines("SYNTH", sentences), tick=0.05)
+
+def synthetic_running():
+    source = ingest_engine.sources.get("SYNTH")
+    return source is not None and source.is_alive()
+
+
+# === AIS DECODER ===
+# Server-side decoding of !AIVDM/!AIVDO payloads, so every connected browser
+# does not redo the same bit-unpacking. Multi-fragment messages are reassembled
+# by sequence ID, then decoded into vessel records (types 1/2/3/5/18/19/24).
+
+# Lookup tables: armoured payload character -> 6-bit string, 6-bit value -> text character
+AIS_PAYLOAD_BITS = {
+    chr(c): format(c - 48 if c < 88 else c - 56, '06b')
+    for c in list(range(48, 88)) + list(range(96, 120))
+}
+AIS_TEXT_CHARS = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_ !\"#$%&'()*+,-./0123456789:;<=>?"
+
+class AISBitReader:
+    """Random-access reader over a de-armoured AIS payload held as one integer"""
+    __slots__ = ('value', 'length')
+
+    def __init__(self, payload, fill_bits=0):
+        bits = ''.join(map(AIS_PAYLOAD_BITS.__getitem__, payload))  # KeyError on invalid characters
+        self.length = max(len(bits) - fill_bits, 0)
+        self.value = int(bits, 2) >> fill_bits if bits else 0
+
+    def uint(self, start, width):
+        return (self.value >> (self.length - start - width)) & ((1 << width) - 1)
+
+    def int(self, start, width):
+        value = self.uint(start, width)
+        return value - (1 << width) if value & (1 << (width - 1)) else value
+
+    def text(self, start, width):
+        # Extract the whole field once, then peel 6-bit characters off with shifts
+        value = self.uint(start, width)
+        chars = ''.join([AIS_TEXT_CHARS[(value >> shift) & 63] for shift in range(width - 6, -1, -6)])
+        return chars.split('@', 1)[0].strip()
+
+def _ais_position(reader, record, sog_at, lon_at, lat_at, cog_at, heading_at):
+    """Common position fields of types 1/2/3/18/19"""
+    sog = reader.uint(sog_at, 10)
+    lon = reader.int(lon_at, 28)
+    lat = reader.int(lat_at, 27)
+    cog = reader.uint(cog_at, 12)
+    heading = reader.uint(heading_at, 9)
+    # 181° / 91° mean "not available"
+    if lon != 108600000 and lat != 54600000:
+        record['lon'] = round(lon / 600000.0, 6)
+        record['lat'] = round(lat / 600000.0, 6)
+    record['sog'] = sog / 10.0 if sog != 1023 else None
+    record['cog'] = cog / 10.0 if cog < 3600 else None
+    record['heading'] = heading if heading != 511 else None
+
+def _ais_dimensions(reader, record, start):
+    record['to_bow'] = reader.uint(start, 9)
+    record['to_stern'] = reader.uint(start + 9, 9)
+    record['to_port'] = reader.uint(start + 18, 6)
+    record['to_starboard'] = reader.uint(start + 24, 6)
+
+def decode_ais_payload(payload, fill_bits=0):
+    """Decode a complete AIS payload into a vessel record (dict), or None if unsupported"""
+    try:
+        reader = AISBitReader(payload, fill_bits)
+    except KeyError:
+        return None
+    if reader.length < 38:
+        return None
+
+    msg_type = reader.uint(0, 6)
+    record = {'msg_type': msg_type, 'mmsi': str(reader.uint(8, 30))}
+
+    if msg_type in (1, 2, 3) and reader.length >= 168:
+        record['nav_status'] = reader.uint(38, 4)
+        _ais_position(reader, record, 50, 61, 89, 116, 128)
+    elif msg_type == 5 and reader.length >= 420:
+        record['imo'] = reader.uint(40, 30)
+        record['callsign'] = reader.text(70, 42)
+        record['shipname'] = reader.text(112, 120)
+        record['shiptype'] = reader.uint(232, 8)
+        _ais_dimensions(reader, record, 240)
+        month, day = reader.uint(274, 4), reader.uint(278, 5)
+        hour, minute = reader.uint(283, 5), reader.uint(288, 6)
+        if month and day:
+            record['eta'] = f"{day}/{month} {hour}:{minute:02d}"
+        record['draught'] = reader.uint(294, 8) / 10.0
+        record['destination'] = reader.text(302, 120)
+    elif msg_type == 18 and reader.length >= 168:
+        _ais_position(reader, record, 46, 57, 85, 112, 124)
+    elif msg_type == 19 and reader.length >= 312:
+        _ais_position(reader, record, 46, 57, 85, 112, 124)
+        record['shipname'] = reader.text(143, 120)
+        record['shiptype'] = reader.uint(263, 8)
+        _ais_dimensions(reader, record, 271)
+    elif msg_type == 24 and reader.length >= 160:
+        part = reader.uint(38, 2)
+        if part == 0:
+            record['shipname'] = reader.text(40, 120)
+        elif part == 1 and reader.length >= 162:
+            record['shiptype'] = reader.uint(40, 8)
+            record['callsign'] = reader.text(90, 42)
+            _ais_dimensions(reader, record, 132)
+        else:
+            return None
+    else:
+        return None
+
+    return record
+
+class AISDecoder:
+    """Reassembles multi-fragment !AIVDM/!AIVDO sentences and decodes them"""
+    def __init__(self, fragment_timeout=30.0, max_pending=256):
+        self.fragment_timeout = fragment_timeout
+        self.max_pending = max_pending
+        self.pending = collections.OrderedDict()  # (source, seq_id, total) -> [created, {num: (payload, fill)}]
+        self.lock = threading.Lock()
+        self.stats = {'decoded': 0, 'fragments': 0, 'expired_fragments': 0, 'unsupported': 0, 'errors': 0}
+
+    def feed(self, record):
+        """Feed one parsed VDM/VDO record; returns a vessel record when a message completes"""
+        fields = record.fields
+        if len(fields) < 6:
+            return None
+        try:
+            total = int(fields[0])
+            number = int(fields[1])
+            fill_bits = int(fields[5] or 0)
+        except ValueError:
+            with self.lock:
+                self.stats['errors'] += 1
+            return None
+
+        payload = fields[4]
+        if total > 1:
+            with self.lock:
+                self.stats['fragments'] += 1
+                self._expire(record.received_at)
+                key = (record.source, fields[2], total)
+                group = self.pending.get(key)
+                if group is None:
+                    group = self.pending[key] = [record.received_at, {}]
+                group[1][number] = (payload, fill_bits)
+                if len(group[1]) < total:
+                    return None
+                del self.pending[key]
+            parts = group[1]
+            if any(i not in parts for i in range(1, total + 1)):
+                return None
+            payload = ''.join(parts[i][0] for i in range(1, total + 1))
+            fill_bits = parts[total][1]
+
+        vessel = decode_ais_payload(payload, fill_bits)
+        with self.lock:
+            if vessel is None:
+                self.stats['unsupported'] += 1
+            else:
+                self.stats['decoded'] += 1
+        if vessel is not None:
+            vessel['own'] = record.sentence_type == 'VDO'
+        return vessel
+
+    def _expire(self, now):
+        """Drop incomplete fragment groups (oldest first, O(expired))"""
+        while self.pending:
+            key, group = next(iter(self.pending.items()))
+            if now - group[0] <= self.fragment_timeout and len(self.pending) <= self.max_pending:
+                break
+            del self.pending[key]
+            self.stats['expired_fragments'] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['pending_groups'] = len(self.pending)
+        return stats
+
+# Global AIS decoder instance
+ais_decoder = AISDecoder()
+AIS_SENTENCE_TYPES = frozenset(('VDM', 'VDO'))
+
+
+# === VESSEL STATE TABLE ===
+# Authoritative MMSI -> vessel state on the server. Decoded AIS messages are
+# merged into compact records and marked dirty; a tick thread pushes only the
+# vessels that changed since the last tick ('vessel_delta'), and newly
+# connected clients get the whole table once ('vessel_snapshot'). Silent
+# vessels age out through a timer wheel ('vessel_removed').
+
+def parse_expiry_policy(spec):
+    """Parse "status:seconds,..." into {nav_status: seconds}; invalid pairs are ignored"""
+    policy = {}
+    for pair in spec.split(','):
+        status, _, seconds = pair.partition(':')
+        try:
+            policy[int(status)] = max(int(seconds), 10)
+        except ValueError:
+            if pair.strip():
+                main_logger.warning(f"[VESSELS] Ignoring invalid expiry policy entry: '{pair.strip()}'")
+    return policy
+
+class ExpiryWheel:
+    """Hashed timer wheel: keys are bucketed by deadline, so expiry costs O(expired)
+
+    Each key lives in exactly one bucket (rescheduling moves it). advance() only
+    walks the buckets whose time has passed instead of scanning every key.
+    """
+    def __init__(self, resolution=1.0):
+        self.resolution = resolution
+        self.buckets = {}    # bucket number -> set of keys
+        self.deadlines = {}  # key -> bucket number
+        self.current = None  # last bucket advanced to
+
+    def schedule(self, key, deadline):
+        bucket = int(deadline // self.resolution)
+        if self.current is not None and bucket < self.current:
+            bucket = self.current  # already due: picked up by the next advance()
+        previous = self.deadlines.get(key)
+        if previous == bucket:
+            return
+        if previous is not None:
+            self._discard(previous, key)
+        self.deadlines[key] = bucket
+        self.buckets.setdefault(bucket, set()).add(key)
+
+    def cancel(self, key):
+        bucket = self.deadlines.pop(key, None)
+        if bucket is not None:
+            self._discard(bucket, key)
+
+    def _discard(self, bucket, key):
+        keys = self.buckets.get(bucket)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.buckets[bucket]
+
+    def advance(self, now):
+        """Return the keys whose deadline is <= now and forget them"""
+        target = int(now // self.resolution)
+        if self.current is None:
+            self.current = min(self.buckets, default=target)
+        if target - self.current > len(self.buckets):
+            # Long idle gap: visit only the buckets that exist
+            due = sorted(bucket for bucket in self.buckets if bucket <= target)
+        else:
+            due = [bucket for bucket in range(self.current, target + 1) if bucket in self.buckets]
+        expired = []
+        for bucket in due:
+            for key in self.buckets.pop(bucket):
+                del self.deadlines[key]
+                expired.append(key)
+        self.current = target  # the current bucket may still receive already-due keys
+        return expired
+
+    def __len__(self):
+        return len(self.deadlines)
+
+EARTH_RADIUS_NM = 3440.065
+
+def distance_nm(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance in nautical miles"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * math.asin(min(1.0, math.sqrt(a)))
+
+class SpatialGrid:
+    """Uniform lat/lon grid index, updated incrementally as positions arrive
+
+    Only occupied cells are stored, so a bounding-box query touches the cells
+    it overlaps (or, for very large boxes, the occupied cells) instead of every
+    position.
+    """
+    def __init__(self, cell_deg=0.1):
+        self.cell_deg = cell_deg
+        self.cells = {}      # (row, col) -> set of keys
+        self.positions = {}  # key -> (lat, lon, (row, col))
+
+    def _cell(self, lat, lon):
+        return (int(math.floor((lat + 90.0) / self.cell_deg)), int(math.floor((lon + 180.0) / self.cell_deg)))
+
+    def update(self, key, lat, lon):
+        cell = self._cell(lat, lon)
+        previous = self.positions.get(key)
+        if previous is not None and previous[2] != cell:
+            self._discard(previous[2], key)
+        if previous is None or previous[2] != cell:
+            self.cells.setdefault(cell, set()).add(key)
+        self.positions[key] = (lat, lon, cell)
+
+    def remove(self, key):
+        previous = self.positions.pop(key, None)
+        if previous is not None:
+            self._discard(previous[2], key)
+
+    def _discard(self, cell, key):
+        keys = self.cells.get(cell)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.cells[cell]
+
+    def query_bbox(self, south, west, north, east):
+        """Keys inside the box; west > east means the box crosses the antimeridian"""
+        if west > east:
+            return self.query_bbox(south, west, north, 180.0) + self.query_bbox(south, -180.0, north, east)
+        row_min, col_min = self._cell(south, west)
+        row_max, col_max = self._cell(north, east)
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > len(self.cells):
+            candidate_cells = [cell for cell in self.cells
+                               if row_min <= cell[0] <= row_max and col_min <= cell[1] <= col_max]
+        else:
+            candidate_cells = [(row, col) for row in range(row_min, row_max + 1)
+                               for col in range(col_min, col_max + 1) if (row, col) in self.cells]
+        result = []
+        for cell in candidate_cells:
+            for key in self.cells[cell]:
+                lat, lon, _ = self.positions[key]
+                if south <= lat <= north and west <= lon <= east:
+                    result.append(key)
+        return result
+
+    def query_radius(self, lat, lon, radius_nm):
+        """[(key, distance_nm)] within radius_nm of (lat, lon), nearest first"""
+        # Bounding box of the circle (exact on the sphere, also for large radii)
+        angle = radius_nm / EARTH_RADIUS_NM
+        dlat = math.degrees(angle)
+        ratio = math.sin(angle) / max(math.cos(math.radians(lat)), 1e-12)
+        if abs(lat) + dlat >= 90.0 or angle >= math.pi / 2 or ratio >= 1.0:
+            south, north, west, east = max(lat - dlat, -90.0), min(lat + dlat, 90.0), -180.0, 180.0
+        else:
+            dlon = math.degrees(math.asin(ratio))
+            south, north = lat - dlat, lat + dlat
+            west, east = lon - dlon, lon + dlon
+            # Wrap around the antimeridian
+            if west < -180.0:
+                west += 360.0
+            if east > 180.0:
+                east -= 360.0
+        result = []
+        for key in self.query_bbox(south, west, north, east):
+            key_lat, key_lon, _ = self.positions[key]
+            distance = distance_nm(lat, lon, key_lat, key_lon)
+            if distance <= radius_nm:
+                result.append((key, distance))
+        result.sort(key=operator.itemgetter(1))
+        return result
+
+    def __len__(self):
+        return len(self.positions)
+
+# Clients that sent 'subscribe_viewport': sid -> (south, west, north, east), margin included
+viewport_clients = {}
+# MMSIs each viewport client currently displays (told with 'vessel_removed' when one leaves the area)
+viewport_visible = {}
+
+def make_viewport(south, west, north, east, margin=0.25):
+    """Validate map bounds and widen them by a margin; returns (south, west, north, east)"""
+    south, north = max(south, -90.0), min(north, 90.0)
+    if south > north:
+        raise ValueError("south is above north")
+    lat_pad = (north - south) * margin
+    span = (east - west) % 360.0 if east != west else 360.0
+    if east - west >= 360.0 or span * (1 + 2 * margin) >= 360.0:
+        west, east = -180.0, 180.0
+    else:
+        lon_pad = span * margin
+        west = (west - lon_pad + 180.0) % 360.0 - 180.0
+        east = (east + lon_pad + 180.0) % 360.0 - 180.0
+    return (max(south - lat_pad, -90.0), west, min(north + lat_pad, 90.0), east)
+
+def viewport_contains(viewport, lat, lon):
+    south, west, north, east = viewport
+    if not south <= lat <= north:
+        return False
+    if west <= east:
+        return west <= lon <= east
+    return lon >= west or lon <= east  # crosses the antimeridian
+
+class VesselState:
+    """Last known state of one AIS target"""
+    __slots__ = (
+        'mmsi', 'own', 'ais_class', 'source', 'first_seen', 'last_seen', 'updates',
+        'nav_status', 'lat', 'lon', 'sog', 'cog', 'heading',
+        'imo', 'callsign', 'shipname', 'shiptype', 'destination', 'eta', 'draught',
+        'to_bow', 'to_stern', 'to_port', 'to_starboard'
+    )
+    # Decoded AIS keys copied as-is into the record
+    MERGED_FIELDS = frozenset(__slots__[7:])
+
+    def __init__(self, mmsi, received_at):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        self.mmsi = mmsi
+        self.own = False
+        self.first_seen = received_at
+        self.last_seen = received_at
+        self.updates = 0
+
+    def merge(self, decoded, source, received_at):
+        """Merge one decoded AIS message into the record"""
+        for key, value in decoded.items():
+            if key in self.MERGED_FIELDS:
+                setattr(self, key, value)
+        msg_type = decoded.get('msg_type')
+        if msg_type in (1, 2, 3, 5):
+            self.ais_class = 'A'
+        elif msg_type in (18, 19, 24):
+            self.ais_class = 'B'
+        self.own = self.own or decoded.get('own', False)
+        self.source = source
+        self.last_seen = received_at
+        self.updates += 1
+
+    def to_dict(self):
+        """JSON-friendly view (unknown fields are left out)"""
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        return data
+
+class VesselTable:
+    """MMSI-keyed vessel table with a dirty set flushed at a fixed tick rate"""
+    def __init__(self, tick_ms=1000, expiry_default=360, expiry_by_status=None, grid_cell_deg=0.1):
+        self.tick = tick_ms / 1000.0
+        self.vessels = {}  # mmsi -> VesselState
+        self.dirty = set()
+        self.expiry_default = expiry_default
+        self.expiry_by_status = expiry_by_status or {}
+        self.expiry = ExpiryWheel(resolution=max(self.tick, 1.0))
+        self.grid = SpatialGrid(grid_cell_deg)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {'updates': 0, 'ticks': 0, 'deltas_sent': 0, 'snapshots_sent': 0, 'expired': 0, 'viewport_exits': 0}
+
+    def start(self):
+        """Start the delta broadcaster"""
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._tick_loop, name="vessel-table", daemon=True)
+            self.thread.start()
+            main_logger.info(f"[VESSELS] Vessel table active (delta tick {int(self.tick * 1000)} ms)")
+
+    def stop(self):
+        self.stop_event.set()
+
+    def update(self, decoded, source, received_at):
+        """Merge a decoded AIS message and mark the vessel dirty"""
+        mmsi = decoded['mmsi']
+        with self.lock:
+            vessel = self.vessels.get(mmsi)
+            if vessel is None:
+                vessel = self.vessels[mmsi] = VesselState(mmsi, received_at)
+            vessel.merge(decoded, source, received_at)
+            self.dirty.add(mmsi)
+            self.expiry.schedule(mmsi, received_at + self.ttl(vessel))
+            if 'lat' in decoded:
+                self.grid.update(mmsi, vessel.lat, vessel.lon)
+            self.stats['updates'] += 1
+        return vessel
+
+    def ttl(self, vessel):
+        """Seconds a vessel may stay silent before it is dropped (per navigational status)"""
+        return self.expiry_by_status.get(vessel.nav_status, self.expiry_default)
+
+    def expire(self, now):
+        """Remove vessels past their deadline; returns their MMSIs"""
+        with self.lock:
+            expired = self.expiry.advance(now)
+            for mmsi in expired:
+                self.vessels.pop(mmsi, None)
+                self.dirty.discard(mmsi)
+                self.grid.remove(mmsi)
+                for visible in viewport_visible.values():
+                    visible.discard(mmsi)
+            self.stats['expired'] += len(expired)
+        return expired
+
+    def broadcast_removed(self, now):
+        """Drop stale vessels and tell the clients"""
+        expired = self.expire(now)
+        if not expired:
+            return
+        if DEBUG:
+            debug_logger.debug(f"[VESSELS] Expired {len(expired)} stale vessel(s)")
+        if not connected_clients or not socketio_circuit_breaker.can_emit():
+            return
+        try:
+            socketio.emit('vessel_removed', {'mmsi': expired, 'count': len(expired)})
+            socketio_circuit_breaker.record_success()
+        except Exception as removed_error:
+            socketio_circuit_breaker.record_failure()
+            if DEBUG:
+                debug_logger.debug(f"Vessel removed emit error: {removed_error}")
+
+    def snapshot(self):
+        """All known vessels"""
+        with self.lock:
+            return [vessel.to_dict() for vessel in self.vessels.values()]
+
+    def in_bbox(self, south, west, north, east):
+        """Positioned vessels inside a bounding box"""
+        with self.lock:
+            return [self.vessels[mmsi].to_dict() for mmsi in self.grid.query_bbox(south, west, north, east)]
+
+    def near(self, lat, lon, radius_nm):
+        """Positioned vessels within radius_nm, nearest first (with 'distance_nm')"""
+        with self.lock:
+            result = []
+            for mmsi, distance in self.grid.query_radius(lat, lon, radius_nm):
+                vessel = self.vessels[mmsi].to_dict()
+                vessel['distance_nm'] = round(distance, 3)
+                result.append(vessel)
+            return result
+
+    def take_delta(self):
+        """Vessels changed since the previous call (clears the dirty set)"""
+        with self.lock:
+            if not self.dirty:
+                return []
+            dirty, self.dirty = self.dirty, set()
+            return [self.vessels[mmsi].to_dict() for mmsi in dirty if mmsi in self.vessels]
+
+    def in_viewport(self, viewport):
+        """Vessels a viewport subscriber should know about (own ship always included)"""
+        south, west, north, east = viewport
+        with self.lock:
+            mmsis = set(self.grid.query_bbox(south, west, north, east))
+            mmsis.update(mmsi for mmsi, vessel in self.vessels.items() if vessel.own)
+            return [self.vessels[mmsi].to_dict() for mmsi in mmsis]
+
+    def broadcast_delta(self):
+        """Push changed vessels to every connected client (viewport subscribers get their area only)"""
+        vessels = self.take_delta()
+        if not vessels or not connected_clients or not socketio_circuit_breaker.can_emit():
+            return
+        viewports = list(viewport_clients.items())
+        try:
+            if len(viewports) < len(connected_clients):
+                socketio.emit('vessel_delta', {'vessels': vessels, 'count': len(vessels)},
+                              skip_sid=[sid for sid, _ in viewports] or None)
+                self.stats['deltas_sent'] += 1
+            for sid, viewport in viewports:
+                visible = viewport_visible.get(sid)
+                if visible is None or sid not in viewport_clients:
+                    continue  # disconnected/unsubscribed since the snapshot: don't recreate its entry
+                scoped = []
+                left = []
+                for vessel in vessels:
+                    mmsi = vessel['mmsi']
+                    if vessel.get('own') or ('lat' in vessel and viewport_contains(viewport, vessel['lat'], vessel['lon'])):
+                        scoped.append(vessel)
+                        visible.add(mmsi)
+                    elif mmsi in visible:
+                        visible.discard(mmsi)
+                        left.append(mmsi)
+                if scoped:
+                    socketio.emit('vessel_delta', {'vessels': scoped, 'count': len(scoped)}, room=sid)
+                    self.stats['deltas_sent'] += 1
+                if left:
+                    socketio.emit('vessel_removed', {'mmsi': left, 'count': len(left), 'reason': 'viewport'}, room=sid)
+                    self.stats['viewport_exits'] += 1
+            socketio_circuit_breaker.record_success()
+        except Exception as delta_error:
+            socketio_circuit_breaker.record_failure()
+            if DEBUG:
+                debug_logger.debug(f"Vessel delta emit error: {delta_error}")
+
+    def _tick_loop(self):
+        while not self.stop_event.is_set() and not shutdown_event.is_set():
+            self.stop_event.wait(self.tick)
+            self.stats['ticks'] += 1
+            try:
+                self.broadcast_removed(time.time())
+                self.broadcast_delta()
+            except Exception as e:
+                error_logger.error(f"[VESSELS] Tick error: {e}")
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['vessels'] = len(self.vessels)
+            stats['dirty'] = len(self.dirty)
+            stats['scheduled'] = len(self.expiry)
+            stats['positioned'] = len(self.grid)
+            stats['grid_cells'] = len(self.grid.cells)
+        stats['viewport_clients'] = len(viewport_clients)
+        stats['tick_ms'] = int(self.tick * 1000)
+        stats['expiry_default'] = self.expiry_default
+        return stats
+
+# Global vessel table (delta broadcaster is started in main_thread())
+vessel_table = VesselTable(
+    VESSEL_TICK_MS,
+    expiry_default=VESSEL_EXPIRY_DEFAULT,
+    expiry_by_status=parse_expiry_policy(VESSEL_EXPIRY_BY_STATUS),
+    grid_cell_deg=VESSEL_GRID_CELL_DEG
+)
+
+
+# === NMEA LINE FRAMER ===
+# Shared by every TCP/UDP/serial listener. Received bytes are appended to a
+# bytearray and line boundaries are located with find(), so a burst is framed
+# in linear time. Only complete sentences are decoded, and all transports use
+# the same overflow/resync rule.
+class NMEALineFramer:
+    """Incremental bytes-based line framer for NMEA streams"""
+    def __init__(self, name="FRAMER", max_line_length=4096):
+        self.name = name
+        self.max_line_length = max_line_length
+        self.buffer = bytearray()
+        self.stats = {'bytes': 0, 'lines': 0, 'overflows': 0}
+
+    def feed(self, data):
+        """Append received bytes and return the list of complete decoded lines"""
+        buf = self.buffer
+        buf += data
+        self.stats['bytes'] += len(data)
+
+        # Everything up to the last line ending is complete: decode it in one go
+        # ('\n' never occurs inside a multi-byte UTF-8 sequence) and keep the tail
+        end = buf.rfind(b'\n')
+        if end < 0:
+            if len(buf) > self.max_line_length:
+                self._resync()
+            return []
+
+        with memoryview(buf) as view:
+            text = str(view[:end], 'utf-8', 'ignore')
+        del buf[:end + 1]
+        if len(buf) > self.max_line_length:
+            self._resync()
+
+        lines = [line.rstrip('\r') for line in text.split('\n')]
+        lines = [line for line in lines if line]
+        self.stats['lines'] += len(lines)
+        return lines
+
+    def flush(self):
+        """Return the pending partial line (e.g. at the end of a UDP datagram) and reset"""
+        buf = self.buffer
+        line = str(buf.rstrip(b'\r'), 'utf-8', 'ignore') if buf else ""
+        buf.clear()
+        if line:
+            self.stats['lines'] += 1
+        return line
+
+    def feed_datagram(self, data):
+        """Frame a self-contained datagram: its last sentence may lack a line ending"""
+        lines = self.feed(data)
+        tail = self.flush()
+        if tail:
+            lines.append(tail)
+        return lines
+
+    def reset(self):
+        """Discard buffered data (e.g. after a reconnection)"""
+        self.buffer.clear()
+
+    def _resync(self):
+        """Overflow protection: keep only the last sentence start, if any"""
+        buf = self.buffer
+        self.stats['overflows'] += 1
+        restart = max(buf.rfind(b'$'), buf.rfind(b'!'))
+        if 0 < restart and len(buf) - restart <= self.max_line_length:
+            del buf[:restart]
+        else:
+            buf.clear()
+        network_logger.warning(f"[{self.name}] Line buffer overflow (no line ending in {self.max_line_length} bytes), resynchronising")
+
+
+# === INGEST ENGINE ===
+# Every input (UDP, TCP, serial) runs as one greenlet owned by the ingest
+# engine. Sockets block cooperatively on the gevent hub instead of polling
+# with 1-second timeouts, and a source is stopped by killing its greenlet
+# (GreenletExit is raised inside the pending recv/accept), not by a flag.
+# All sources feed the same pipeline: ingest_lines() -> emit_nmea_data().
+
+class IngestSource:
+    """One running ingest source; stopping it cancels the greenlet"""
+    def __init__(self, name, target, args=()):
+        self.name = name
+        self.target = target
+        self.args = args
+        self.greenlet = None
+        self.started_at = None
+        self.stats = {'lines': 0, 'emitted': 0, 'rejected': 0}
+
+    def start(self):
+        self.started_at = time.time()
+        self.greenlet = gevent.spawn(self._run)
+        return self
+
+    def _run(self):
+        try:
+            self.target(*self.args)
+        except gevent.GreenletExit:
+            raise
+        except Exception as e:
+            error_logger.error(f"[INGEST] Source {self.name} crashed: {e}")
+
+    def is_alive(self):
+        return self.greenlet is not None and not self.greenlet.dead
+
+    def join(self, timeout=None):
+        if self.greenlet is not None:
+            self.greenlet.join(timeout)
+
+    def stop(self, block=True, timeout=2.0):
+        if self.greenlet is not None and not self.greenlet.dead:
+            self.greenlet.kill(block=block, timeout=timeout)
+
+class IngestEngine:
+    """Owns the ingest sources and the shared line pipeline"""
+    def __init__(self):
+        self.sources = {}  # name -> IngestSource
+
+    def start(self, name, target, *args):
+        """Start (or restart) a named source"""
+        self.stop(name)
+        source = self.sources[name] = IngestSource(name, target, args)
+        debug_logger.debug(f"[INGEST] Starting source {name}")
+        return source.start()
+
+    def stop(self, name, block=True):
+        source = self.sources.get(name)
+        if source is not None:
+            source.stop(block=block)
+
+    def stop_all(self, block=True, keep=()):
+        for name, source in list(self.sources.items()):
+            if name not in keep:
+                source.stop(block=block)
+
+    def ingest_lines(self, source, lines, log=False, stats_key=None, received_at=None):
+        """Shared pipeline for framed lines: sanitize, filter, emit; returns the number emitted
+
+        stats_key selects the engine source to count against when the source tag
+        is more specific (e.g. "TCP:10.0.0.5:40312" is counted under "TCP").
+        received_at is the time the lines were framed (defaults to the parse time).
+        """
+        key = stats_key or source
+        counters = self.sources[key].stats if key in self.sources else None
+        emitted = 0
+        for line in lines:
+            message, talker, sentence_type = sanitize_nmea_sentence(line)
+            if not talker:
+                continue  # not an NMEA/AIS sentence
+            if REJECTED_PATTERN.match(message):
+                if counters is not None:
+                    counters['rejected'] += 1
+                continue
+            if log:
+                nmea_logger.info(f"[{source}] {message}")
+            emit_nmea_data(source, message, received_at, talker=talker, sentence_type=sentence_type)
+            emitted += 1
+        if counters is not None:
+            counters['lines'] += len(lines)
+            counters['emitted'] += emitted
+        return emitted
+
+    def get_stats(self):
+        return {
+            name: dict(source.stats, alive=source.is_alive(), started_at=source.started_at)
+            for name, source in self.sources.items()
+        }
+
+# Global ingest engine (sources are started by manage_threads())
+ingest_engine = IngestEngine()
 
 
 # Function to listen to UDP broadcasts in server mode
 # This function listens for UDP broadcasts on a specified port and emits the received NMEA data.
-def udp_listener(stop_event):
+def udp_listener():
 # Force binding IP
     bind_ip = "0.0.0.0"  # Force for Windows
     
@@ -663,18 +2189,12 @@ def udp_listener(stop_event):
     try:
         sock.bind((bind_ip, UDP_PORT))  # Use bind_ip instead of UDP_IP
         main_logger.info(f"[UDP] Listening on {bind_ip}:{UDP_PORT}")
-        sock.settimeout(1.0)
+        framer = NMEALineFramer("UDP")
         
-        while not stop_event.is_set() and not shutdown_event.is_set():
+        while True:
             try:
-                data, addr = sock.recvfrom(1024)
-                message = clean_nmea_data(data.decode('utf-8', errors='ignore'))
-                if not REJECTED_PATTERN.match(message):
-                    #nmea_logger.info(f"[UDP] {message}")
-                    if message and message.strip():
-                        emit_nmea_data("UDP", message.strip())
-            except socket.timeout:
-                continue
+                data, addr = sock.recvfrom(4096)
+                ingest_engine.ingest_lines("UDP", framer.feed_datagram(data))
             except Exception as e:
                 if not shutdown_event.is_set():
                     main_logger.info(f"[UDP] Error: {e}")
@@ -688,15 +2208,14 @@ def udp_listener(stop_event):
             sock.close()
         except:
             pass
-            
-    main_logger.info("[UDP] Stopped.")
+        main_logger.info("[UDP] Stopped.")
 
 # Function to listen to UDP broadcasts in client mode
 # This function listens for UDP broadcasts on a specified port and emits the received NMEA data.
 # It is designed to handle incoming messages, filter out unwanted patterns, and emit valid NMEA data.
-# It uses a stop event to allow graceful shutdown of the listener thread.
+# It is stopped by cancelling its ingest source.
 
-def udp_client_listener(target_ip, target_port, stop_event):
+def udp_client_listener(target_ip, target_port):
     """UDP listening in client/broadcast mode"""
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     
@@ -704,122 +2223,143 @@ def udp_client_listener(target_ip, target_port, stop_event):
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
     
-    # Bind on all interfaces to receive broadcasts
-    sock.bind(('0.0.0.0', target_port))
-    
-    main_logger.info(f"[UDP-CLIENT] Listening for broadcasts on port {target_port}")
-    sock.settimeout(1.0)
-    
-    while not stop_event.is_set() and not shutdown_event.is_set():
-        try:
-            data, addr = sock.recvfrom(1024)
-            message = data.decode('utf-8', errors='ignore').strip()
-            
-            if not REJECTED_PATTERN.match(message):
-                nmea_logger.info(f"[UDP-CLIENT] {message}")
-                if message and message.strip():
-                    emit_nmea_data("UDP", message.strip())
-                    
-        except socket.timeout:
-            continue
-        except Exception as e:
-            if not shutdown_event.is_set():
-                main_logger.info(f"[UDP-CLIENT] Error: {e}")
-            break
-            
-    sock.close()
-    main_logger.info("[UDP-CLIENT] Stopped.")
-
-def tcp_listener(stop_event):
-    """TCP listening in server mode with structured logs"""
-    global TCP_PORT
-    
-    bind_ip = "0.0.0.0"
-    
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
     try:
-        sock.bind((bind_ip, TCP_PORT))
-        sock.listen(1)
-        main_logger.info(f"TCP server listening on port {TCP_PORT}")
-        sock.settimeout(1.0)
+        # Bind on all interfaces to receive broadcasts
+        sock.bind(('0.0.0.0', target_port))
+        
+        main_logger.info(f"[UDP-CLIENT] Listening for broadcasts on port {target_port}")
+        framer = NMEALineFramer("UDP-CLIENT")
         
-        while not stop_event.is_set() and not shutdown_event.is_set():
+        while True:
             try:
-                conn, addr = sock.accept()
-                main_logger.info(f"TCP client connected: {addr[0]}")
-                
-                with conn:
-                    conn.settimeout(1.0)
-                    buffer = ""
-                    
-                    while not stop_event.is_set() and not shutdown_event.is_set():
-                        try:
-                            data = conn.recv(1024)
-                            if not data:
-                                debug_logger.debug(f"TCP client disconnected: {addr[0]}")
-                                break
-                            
-                            # Detailed network LOG to file
-                            raw_data = data.decode('utf-8', errors='ignore')
-                            network_logger.debug(f"TCP received {len(data)} bytes from {addr}")
-                            
-                            buffer += raw_data
-                            
-                            # Process all complete lines in buffer
-                            line_count = 0
-                            while '\n' in buffer:
-                                line, buffer = buffer.split('\n', 1)
-                                line_count += 1
-                                
-                                message = clean_nmea_data(line)
-                                
-                                if message:
-                                    pattern_match = REJECTED_PATTERN.match(message)
-                                    
-                                    if not pattern_match:
-                                        # LOG only accepted frames
-                                        debug_logger.debug(f"TCP message accepted: {message[:50]}...")
-                                        emit_nmea_data("TCP", message.strip())
-                                    else:
-                                        debug_logger.debug(f"TCP message rejected by pattern: {message[:30]}...")
-                            
-                            # Protection against buffer too large
-                            if len(buffer) > 4096:
-                                network_logger.warning("TCP buffer overflow, clearing")
-                                buffer = ""
-                                
-                        except socket.timeout:
-                            continue
-                        except Exception as e:
-                            if not shutdown_event.is_set():
-                                error_logger.error(f"TCP connection error with {addr}: {e}")
-                            break
-                            
-            except socket.timeout:
-                continue
+                data, addr = sock.recvfrom(4096)
+                ingest_engine.ingest_lines("UDP", framer.feed_datagram(data), log=True)
             except Exception as e:
                 if not shutdown_event.is_set():
-                    error_logger.error(f"TCP accept error: {e}")
+                    main_logger.info(f"[UDP-CLIENT] Error: {e}")
                 break
-                
-    except Exception as e:
-        error_logger.error(f"TCP bind error on {bind_ip}:{TCP_PORT} - {e}")
-        if "10049" in str(e):
-            main_logger.error("TCP Windows Error 10049: Invalid address - using 0.0.0.0")
-        elif "10048" in str(e):
-            main_logger.error("TCP Port already in use - try another port")
-        return
     finally:
+        sock.close()
+        main_logger.info("[UDP-CLIENT] Stopped.")
+
+class TCPIngestServer:
+    """TCP ingest server accepting many simultaneous NMEA producers
+
+    Each connection gets its own greenlet, framer and counters, and its
+    sentences are tagged "TCP:<ip>:<port>". Connections over the limit are
+    refused; connections silent for longer than idle_timeout are closed.
+    """
+    def __init__(self, port, max_connections=16, idle_timeout=300.0, bind_ip="0.0.0.0"):
+        self.port = port
+        self.bind_ip = bind_ip
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout or None
+        self.pool = Pool(max_connections)
+        self.connections = {}  # source tag -> per-connection counters
+        self.stats = {'accepted': 0, 'refused': 0, 'idle_closed': 0}
+
+    def serve(self):
+        """Accept loop (runs as the "TCP" ingest source, cancelled by killing it)"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         try:
-            sock.close()
-        except:
-            pass
-            
-    main_logger.info("TCP server stopped")
+            sock.bind((self.bind_ip, self.port))
+            sock.listen(max(self.max_connections, 5))
+            main_logger.info(f"TCP server listening on port {self.port} (max {self.max_connections} connections)")
+
+            while True:
+                try:
+                    conn, addr = sock.accept()
+                except Exception as e:
+                    if not shutdown_event.is_set():
+                        error_logger.error(f"TCP accept error: {e}")
+                    break
+                if self.pool.full():
+                    self.stats['refused'] += 1
+                    network_logger.warning(f"TCP connection from {addr[0]}:{addr[1]} refused: {self.max_connections} connections already open")
+                    conn.close()
+                    continue
+                self.stats['accepted'] += 1
+                self.pool.spawn(self._handle, conn, addr)
+
+        except Exception as e:
+            error_logger.error(f"TCP bind error on {self.bind_ip}:{self.port} - {e}")
+            if "10049" in str(e):
+                main_logger.error("TCP Windows Error 10049: Invalid address - using 0.0.0.0")
+            elif "10048" in str(e):
+                main_logger.error("TCP Port already in use - try another port")
+        finally:
+            self.pool.kill(block=False)
+            try:
+                sock.close()
+            except:
+                pass
+            main_logger.info("TCP server stopped")
 
-def tcp_client(stop_event):
+    def _handle(self, conn, addr):
+        """One producer connection"""
+        tag = f"TCP:{addr[0]}:{addr[1]}"
+        counters = self.connections[tag] = {
+            'peer': f"{addr[0]}:{addr[1]}",
+            'connected_at': time.time(),
+            'last_data': None,
+            'bytes': 0,
+            'lines': 0,
+            'emitted': 0
+        }
+        main_logger.info(f"TCP client connected: {counters['peer']} ({len(self.connections)} open)")
+        framer = NMEALineFramer(tag)
+        try:
+            conn.settimeout(self.idle_timeout)
+            while True:
+                try:
+                    data = conn.recv(4096)
+                except socket.timeout:
+                    self.stats['idle_closed'] += 1
+                    main_logger.info(f"TCP client {counters['peer']} idle for {self.idle_timeout:g}s, closing")
+                    break
+                if not data:
+                    debug_logger.debug(f"TCP client disconnected: {counters['peer']}")
+                    break
+
+                # Detailed network LOG to file
+                network_logger.debug(f"TCP received {len(data)} bytes from {counters['peer']}")
+                counters['bytes'] += len(data)
+                counters['last_data'] = time.time()
+                lines = framer.feed(data)
+                counters['lines'] += len(lines)
+                counters['emitted'] += ingest_engine.ingest_lines(tag, lines, stats_key="TCP")
+        except Exception as e:
+            if not shutdown_event.is_set():
+                error_logger.error(f"TCP connection error with {counters['peer']}: {e}")
+        finally:
+            try:
+                conn.close()
+            except:
+                pass
+            self.connections.pop(tag, None)
+            # Keep the per-source parser counters and buckets bounded across reconnects
+            nmea_parser.merge_source(tag, "TCP")
+            rate_limiter.forget_source(tag)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['open'] = len(self.connections)
+        stats['max_connections'] = self.max_connections
+        stats['idle_timeout'] = self.idle_timeout
+        stats['connections'] = {tag: dict(counters) for tag, counters in self.connections.items()}
+        return stats
+
+# Current TCP ingest server (created by tcp_listener() in TCP_MODE=server)
+tcp_ingest_server = None
+
+def tcp_listener():
+    """TCP listening in server mode: many simultaneous producers"""
+    global tcp_ingest_server
+    tcp_ingest_server = TCPIngestServer(TCP_PORT, TCP_MAX_CONNECTIONS, TCP_IDLE_TIMEOUT)
+    tcp_ingest_server.serve()
+
+def tcp_client():
     """TCP connection in client mode with exponential backoff"""
     global TCP_TARGET_IP, TCP_TARGET_PORT
     
@@ -827,8 +2367,10 @@ def tcp_client(stop_event):
     
     consecutive_failures = 0
     max_backoff = 30  # Maximum 30 seconds backoff
+    silence_warning = 30  # Warn after 30 seconds without data
     
-    while not stop_event.is_set() and not shutdown_event.is_set():
+    while not shutdown_event.is_set():
+        sock = None
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(5.0)
@@ -854,11 +2396,12 @@ def tcp_client(stop_event):
             connection_start = time.time()
             data_count = 0
             
-            # Data reception loop
-            buffer = ""
-            while not stop_event.is_set() and not shutdown_event.is_set():
+            # Data reception loop: the timeout only drives the silence warning
+            sock.settimeout(silence_warning)
+            framer = NMEALineFramer("TCP")
+            while True:
                 try:
-                    data = sock.recv(1024).decode('utf-8', errors='ignore')
+                    data = sock.recv(4096)
                     if not data:
                         connection_duration = time.time() - connection_start
                         if data_count > 0:
@@ -866,20 +2409,13 @@ def tcp_client(stop_event):
                         break
                     
                     last_data_time = time.time()
-                    buffer += data
-                    lines = buffer.split('\n')
-                    buffer = lines[-1]  # Keep the last incomplete line
-                    
-                    for line in lines[:-1]:
-                        message = line.strip()
-                        if message and (message.startswith('$') or message.startswith('!')):
-                            data_count += 1
-                            emit_nmea_data("TCP", message)
+                    lines = framer.feed(data)
+                    data_count += len(lines)
+                    ingest_engine.ingest_lines("TCP", lines)
                             
                 except socket.timeout:
-                    # Check for data silence (no data for over 30 seconds)
-                    if time.time() - last_data_time > 30:
-                        main_logger.warning(f"TCP data silence detected: {time.time() - last_data_time:.1f}s since last data")
+                    # Data silence (no data for over 30 seconds)
+                    main_logger.warning(f"TCP data silence detected: {time.time() - last_data_time:.1f}s since last data")
                     continue
                 except Exception as e:
                     error_logger.error(f"TCP receive error: {e}")
@@ -908,84 +2444,187 @@ def tcp_client(stop_event):
         if consecutive_failures <= 3:  # Only log retry messages for first few attempts
             debug_logger.debug(f"TCP client will retry in {backoff_time}s (attempt #{consecutive_failures})")
         
-        for _ in range(int(backoff_time * 10)):  # backoff_time in 0.1s loops
-            if stop_event.is_set():
-                break
-            time.sleep(0.1)
+        gevent.sleep(backoff_time)  # cancelled immediately when the source is stopped
 
-def tcp_client_listener(target_ip, target_port, stop_event):
+def tcp_client_listener(target_ip, target_port):
     """TCP connection in client mode to a GPS"""
     main_logger.info(f"[TCP-CLIENT] Attempting connection to {target_ip}:{target_port}")
     
     retry_interval = 2  # Reconnection every 2 seconds (reduced to avoid prolonged disconnections)
     
-    while not stop_event.is_set() and not shutdown_event.is_set():
-        sock = None
-        try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5.0)  # Connection timeout
-            
-            # GPS connection
-            sock.connect((target_ip, target_port))
-            main_logger.info(f"[TCP-CLIENT] Connected to {target_ip}:{target_port}")
-            
-            sock.settimeout(1.0)  # Read timeout
-            buffer = ""
-            
-            while not stop_event.is_set() and not shutdown_event.is_set():
-                try:
-                    data = sock.recv(1024)
-                    if not data:
-                        main_logger.info("[TCP-CLIENT] Connection closed by server")
-                        break
+    try:
+        while not shutdown_event.is_set():
+            sock = None
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.settimeout(5.0)  # Connection timeout
+                
+                # GPS connection
+                sock.connect((target_ip, target_port))
+                main_logger.info(f"[TCP-CLIENT] Connected to {target_ip}:{target_port}")
+                
+                sock.settimeout(None)  # Blocking reads on the gevent hub
+                framer = NMEALineFramer("TCP-CLIENT")
+                
+                while True:
+                    try:
+                        data = sock.recv(4096)
+                        if not data:
+                            main_logger.info("[TCP-CLIENT] Connection closed by server")
+                            break
                         
-                    buffer += data.decode('utf-8', errors='ignore')
-                    
-                    # Process complete lines
-                    while '\n' in buffer:
-                        line, buffer = buffer.split('\n', 1)
-                        message = line.strip()
+                        # Process complete lines
+                        ingest_engine.ingest_lines("TCP", framer.feed(data), log=True)
+                                    
+                    except Exception as e:
+                        main_logger.info(f"[TCP-CLIENT] Read error: {e}")
+                        break
                         
-                        if message and not REJECTED_PATTERN.match(message):
-                            nmea_logger.info(f"[TCP-CLIENT] {message}")
-                            if message and message.strip():
-                                emit_nmea_data("TCP", message.strip())
-                                
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    main_logger.info(f"[TCP-CLIENT] Read error: {e}")
-                    break
-                    
-        except socket.timeout:
-            main_logger.info(f"[TCP-CLIENT] Connection timeout to {target_ip}:{target_port}")
-        except ConnectionRefusedError:
-            if DEBUG:
-                main_logger.info(f"[TCP-CLIENT] Connection refused by {target_ip}:{target_port}")
-        except Exception as e:
-            main_logger.info(f"[TCP-CLIENT] Connection error: {e}")
-        finally:
-            if sock:
-                sock.close()
-        
-        # Wait before retry
-        main_logger.info(f"[TCP-CLIENT] Reconnection in {retry_interval} seconds...")
-        for _ in range(retry_interval * 10):  # 2 seconds in 0.1s loops
-            if stop_event.is_set():
+            except socket.timeout:
+                main_logger.info(f"[TCP-CLIENT] Connection timeout to {target_ip}:{target_port}")
+            except ConnectionRefusedError:
+                if DEBUG:
+                    main_logger.info(f"[TCP-CLIENT] Connection refused by {target_ip}:{target_port}")
+            except Exception as e:
+                main_logger.info(f"[TCP-CLIENT] Connection error: {e}")
+            finally:
+                if sock:
+                    sock.close()
+            
+            # Wait before retry
+            main_logger.info(f"[TCP-CLIENT] Reconnection in {retry_interval} seconds...")
+            gevent.sleep(retry_interval)
+    finally:
+        main_logger.info("[TCP-CLIENT] Stopped.")
+
+
+# === SERIAL READER ===
+# Event mode waits on the hub until the port is readable and reads straight
+# into a preallocated buffer with os.readv(): no idle wake-ups and no added
+# latency. Ports without a pollable descriptor (Windows, RFC 2217) do a
+# blocking read on the hub's thread pool instead ("thread" forces that path).
+# "poll" keeps the former in_waiting + 10 ms sleep loop for odd drivers.
+
+class SerialReader:
+    """Reads chunks from an open serial port according to SERIAL_READ_MODE"""
+    def __init__(self, ser, mode="event", size=4096):
+        self.ser = ser
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.fd = None
+        if mode == "event" and hasattr(os, 'readv'):
+            try:
+                self.fd = ser.fileno()
+            except Exception:
+                self.fd = None
+        if self.fd is not None:
+            self.mode = "readv"
+        else:
+            self.mode = "poll" if mode == "poll" else "thread"
+        self.stats = {'reads': 0, 'bytes': 0, 'idle_wakeups': 0}
+
+    def read(self, timeout=None):
+        """Wait for data; returns a bytes-like chunk, valid until the next call (empty on timeout)"""
+        if self.mode == "readv":
+            try:
+                wait_read(self.fd, timeout)
+            except socket.timeout:
+                return b''
+            try:
+                count = os.readv(self.fd, [self.buffer])
+            except BlockingIOError:
+                self.stats['idle_wakeups'] += 1
+                return b''
+            if count == 0:
+                raise serial.SerialException("device reports readiness but returned no data (disconnected?)")
+            data = self.view[:count]
+        elif self.mode == "thread":
+            data = gevent.get_hub().threadpool.apply(self._blocking_read)
+        else:
+            waiting = self.ser.in_waiting
+            if not waiting:
+                self.stats['idle_wakeups'] += 1
+                gevent.sleep(0.01)
+                return b''
+            data = self.ser.read(waiting)
+        if data:
+            self.stats['reads'] += 1
+            self.stats['bytes'] += len(data)
+        else:
+            self.stats['idle_wakeups'] += 1
+        return data
+
+    def _blocking_read(self):
+        """Worker thread: wait up to the port timeout for one byte, then take what is buffered"""
+        data = self.ser.read(1)
+        if data:
+            waiting = self.ser.in_waiting
+            if waiting:
+                data += self.ser.read(waiting)
+        return data
+
+    def get_stats(self):
+        return dict(self.stats, mode=self.mode)
+
+def probe_baudrate(ser, reader, candidates, window, source="SERIAL"):
+    """Try each rate on the open port and return (best rate or None, {rate: valid sentences})
+
+    A rate is locked in as soon as it yields 3 valid-checksum sentences; one
+    that produced 256 bytes without a single valid sentence is abandoned early.
+    None means the port stayed silent, so nothing can be concluded.
+    """
+    scores = {}
+    heard = False
+    for baudrate in candidates:
+        ser.baudrate = baudrate
+        ser.reset_input_buffer()
+        framer = NMEALineFramer(f"{source}-PROBE")
+        valid = received = 0
+        deadline = time.monotonic() + window
+        while valid < 3 and not (received >= 256 and valid == 0):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
                 break
-            time.sleep(0.1)
-    
-    main_logger.info("[TCP-CLIENT] Stopped.")
+            data = reader.read(min(remaining, 0.2))
+            if not data:
+                continue
+            received += len(data)
+            for line in framer.feed(data):
+                sentence = sanitize_nmea_sentence(line)[0]
+                if validate_nmea_checksum(sentence):
+                    valid += 1
+        scores[baudrate] = valid
+        heard = heard or received > 0
+        debug_logger.debug(f"[{source}] Auto-baud {baudrate}: {valid} valid sentences in {received} bytes")
+        if valid >= 3:
+            break
+        if not heard:
+            break  # silent port: every rate would look the same
+    best = max(scores, key=scores.get) if scores else None
+    if best is None or scores[best] == 0:
+        return None, scores
+    return best, scores
 
+def autobaud_candidates(baudrate):
+    """Configured rate first, then SERIAL_AUTOBAUD_RATES without duplicates"""
+    candidates = [baudrate]
+    for entry in SERIAL_AUTOBAUD_RATES.split(','):
+        try:
+            rate = int(entry)
+        except ValueError:
+            continue
+        if rate > 0 and rate not in candidates:
+            candidates.append(rate)
+    return candidates
 
 # Function to listen to the serial port and send NMEA data
 # Uses a buffer to handle pending data and avoid frame loss
-def serial_listener(port, baudrate, stop_event):
-    main_logger.info(f"[SERIAL] Listener starting on {port} @ {baudrate} bps")
+def serial_listener(port, baudrate, source="SERIAL"):
+    main_logger.info(f"[{source}] Listener starting on {port} @ {baudrate} bps")
     
     # Check that the port exists
     if not port or port == "None":
-        main_logger.info("[SERIAL] No serial port configured")
+        main_logger.info(f"[{source}] No serial port configured")
         return
     
     try:
@@ -1009,9 +2648,9 @@ def serial_listener(port, baudrate, stop_event):
                 'inter_byte_timeout': 0.1
             })
         
-        main_logger.info(f"[SERIAL] Attempting to open port {port}...")
+        main_logger.info(f"[{source}] Attempting to open port {port}...")
         with serial.Serial(**serial_kwargs) as ser:
-            main_logger.info(f"[SERIAL] Port opened successfully: {port} @ {baudrate} bps")
+            main_logger.info(f"[{source}] Port opened successfully: {port} @ {baudrate} bps")
             
             # Small delay to stabilize the connection
             time.sleep(0.5)
@@ -1020,50 +2659,57 @@ def serial_listener(port, baudrate, stop_event):
             ser.reset_input_buffer()
             ser.reset_output_buffer()
             
-            buffer = ""
+            framer = NMEALineFramer(source)
+            reader = SerialReader(ser, SERIAL_READ_MODE)
+            main_logger.info(f"[{source}] Read mode: {reader.mode}")
+
+            # New port: find the rate that yields valid sentences (cached per port)
+            if SERIAL_AUTOBAUD and port in serial_detected_baudrates:
+                ser.baudrate = serial_detected_baudrates[port]
+            elif SERIAL_AUTOBAUD:
+                started = time.monotonic()
+                detected, scores = probe_baudrate(ser, reader, autobaud_candidates(baudrate), SERIAL_AUTOBAUD_WINDOW_MS / 1000.0, source)
+                elapsed = time.monotonic() - started
+                if detected is not None:
+                    serial_detected_baudrates[port] = detected
+                    ser.baudrate = detected
+                    main_logger.info(f"[{source}] Auto-baud locked {port} at {detected} bps in {elapsed:.1f}s (scores: {scores})")
+                else:
+                    ser.baudrate = baudrate
+                    main_logger.info(f"[{source}] Auto-baud: no valid sentences in {elapsed:.1f}s, keeping {baudrate} bps")
+                ser.reset_input_buffer()
             consecutive_errors = 0
             
-            while not stop_event.is_set() and not shutdown_event.is_set():
+            while not shutdown_event.is_set():
                 try:
-                    # Check if there's pending data
-                    if ser.in_waiting > 0:
-                        data = ser.read(ser.in_waiting).decode('utf-8', errors='ignore')
-                        if data:
-                            consecutive_errors = 0  # Reset error counter
-                            buffer += data
-                            
-                            # Process complete lines
-                            while '\n' in buffer:
-                                line, buffer = buffer.split('\n', 1)
-                                line = clean_nmea_data(line)
-                                
-                                if line and not REJECTED_PATTERN.match(line):
-                                    nmea_logger.info(f"[SERIAL] {line}")
-                                    if line and line.strip():
-                                        emit_nmea_data("SERIAL", line.strip())
-                    else:
-                        # Small pause if no data
-                        time.sleep(0.01)
+                    # Blocks until data arrives (or the port timeout in thread mode)
+                    data = reader.read()
+                    if data:
+                        consecutive_errors = 0  # Reset error counter
+                        
+                        # Process complete lines, stamped when they are framed
+                        received_at = time.time()
+                        ingest_engine.ingest_lines(source, framer.feed(data), log=True, received_at=received_at)
                         
                 except UnicodeDecodeError:
                     consecutive_errors += 1
                     if consecutive_errors > 10:
-                        main_logger.info("[SERIAL] Too many decoding errors, pausing...")
+                        main_logger.info(f"[{source}] Too many decoding errors, pausing...")
                         time.sleep(1)
                         consecutive_errors = 0
                     continue
                 except Exception as e:
                     consecutive_errors += 1
                     if DEBUG:
-                        main_logger.info(f"[SERIAL] Read error: {e}")
+                        main_logger.info(f"[{source}] Read error: {e}")
                     if consecutive_errors > 20:
-                        main_logger.info("[SERIAL] Too many errors, stopping listener")
+                        main_logger.info(f"[{source}] Too many errors, stopping listener")
                         break
                     time.sleep(0.1)
                     continue
                     
     except serial.SerialException as e:
-        main_logger.info(f"[ERROR][SERIAL] Cannot open port {port}: {e}")
+        main_logger.info(f"[ERROR][{source}] Cannot open port {port}: {e}")
         if IS_WINDOWS:
             main_logger.info("[INFO] Possible solutions:")
             main_logger.info("  1. Check that the COM port exists in Device Manager")
@@ -1074,15 +2720,70 @@ def serial_listener(port, baudrate, stop_event):
             main_logger.info("[INFO] Check serial port access permissions")
             main_logger.info("  sudo chmod 666 /dev/ttyUSB0  # or appropriate port")
     except Exception as e:
-        main_logger.info(f"[ERROR][SERIAL] Unexpected error: {e}")
+        main_logger.info(f"[ERROR][{source}] Unexpected error: {e}")
     
-    main_logger.info("[SERIAL] Stopped.")
+    main_logger.info(f"[{source}] Stopped.")
+
+def parse_serial_sources(spec, default_baudrate=4800):
+    """Parse "NAME=port@baud,..." into [(tag, port, baudrate)]; NAME and @baud are optional"""
+    sources = []
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, rest = entry.partition('=')
+        if not sep:
+            name, rest = '', entry
+        port, sep, baud = rest.strip().rpartition('@')
+        if not sep:
+            port, baud = baud, ''
+        try:
+            baudrate = int(baud) if baud else default_baudrate
+        except ValueError:
+            main_logger.warning(f"[SERIAL] Ignoring serial source with invalid baud rate: '{entry}'")
+            continue
+        port = port.strip()
+        name = (name.strip() or os.path.basename(port)).upper()
+        if not port or not name:
+            main_logger.warning(f"[SERIAL] Ignoring invalid serial source: '{entry}'")
+            continue
+        sources.append((f"SERIAL:{name}", port, baudrate))
+    return sources
+
+def serial_sources():
+    """Configured serial inputs: SERIAL_PORT (tag SERIAL, AUTO = Bluetooth discovery) then SERIAL_SOURCES"""
+    sources = [("SERIAL", SERIAL_PORT, SERIAL_BAUDRATE)]
+    tags = {"SERIAL"}
+    ports = {SERIAL_PORT}
+    for tag, port, baudrate in parse_serial_sources(SERIAL_SOURCES, SERIAL_BAUDRATE):
+        if tag in tags or port in ports:
+            main_logger.warning(f"[SERIAL] Skipping {tag} on {port}: duplicate source name or port")
+            continue
+        tags.add(tag)
+        ports.add(port)
+        sources.append((tag, port, baudrate))
+    return sources
+
+def start_serial_source(tag, port, baudrate):
+    """(Re)start the reader of one serial source; each runs as its own ingest greenlet"""
+    serial_threads[tag] = ingest_engine.start(tag, serial_listener, port, baudrate, tag)
+    return serial_threads[tag]
+
+def stop_serial_source(tag):
+    source = serial_threads.pop(tag, None)
+    if source is not None and source.is_alive():
+        source.stop()
+
+def serial_source_alive(tag):
+    source = serial_threads.get(tag)
+    return source is not None and source.is_alive()
+
 
 def bluetooth_monitor(stop_event):
     """
     Bluetooth monitoring thread that maintains GPS connection automatically
     """
-    global bluetooth_manager, serial_thread
+    global bluetooth_manager
     main_logger.info("[BLUETOOTH-MONITOR] Starting Bluetooth monitoring...")
     
     # Ensure bluetooth_manager is initialized
@@ -1112,10 +2813,9 @@ def bluetooth_monitor(stop_event):
                         main_logger.info(f"Bluetooth GPS connected: {port}")
                         
                         # Stop existing serial thread if there is one
-                        if serial_thread and serial_thread.is_alive():
+                        if serial_source_alive("SERIAL"):
                             debug_logger.debug("Stopping existing serial thread...")
-                            serial_stop.set()
-                            serial_thread.join(timeout=2)
+                            stop_serial_source("SERIAL")
                         
                         # Wait a bit to ensure port is released
                         debug_logger.debug("Waiting for port release...")
@@ -1123,25 +2823,20 @@ def bluetooth_monitor(stop_event):
                         
                         # Start new serial thread
                         debug_logger.debug(f"Starting serial thread on {port}...")
-                        serial_stop.clear()
-                        serial_thread = threading.Thread(target=serial_listener, args=(port, SERIAL_BAUDRATE, serial_stop), daemon=True)
-                        serial_thread.start()
+                        start_serial_source("SERIAL", port, SERIAL_BAUDRATE)
                         
                         # Update global variable for web interface (only if not in AUTO mode)
                         if SERIAL_PORT != "AUTO":
                             SERIAL_PORT = port
-                    elif not (serial_thread and serial_thread.is_alive()):
+                    elif not serial_source_alive("SERIAL"):
                         # Port hasn't changed but serial thread is not active
                         debug_logger.debug(f"Restarting serial thread on {port}...")
-                        serial_stop.clear()
-                        serial_thread = threading.Thread(target=serial_listener, args=(port, SERIAL_BAUDRATE, serial_stop), daemon=True)
-                        serial_thread.start()
+                        start_serial_source("SERIAL", port, SERIAL_BAUDRATE)
                 elif SERIAL_PORT == "AUTO":
                     # In AUTO mode, stop serial thread if no connection
-                    if serial_thread and serial_thread.is_alive():
+                    if serial_source_alive("SERIAL"):
                         debug_logger.debug("No GPS connection - stopping serial thread")
-                        serial_stop.set()
-                        serial_thread.join(timeout=2)
+                        stop_serial_source("SERIAL")
             
             # Wait 60 seconds before next check
             for _ in range(600):  # 60 seconds in 0.1s increments
@@ -1163,24 +2858,21 @@ def bluetooth_monitor(stop_event):
 # Remplacer la fonction manage_threads() par cette version avec debug :
 
 def manage_threads():
-    global serial_thread, udp_thread, tcp_thread, bluetooth_monitor_thread
+    global udp_thread, tcp_thread, bluetooth_monitor_thread
     
     debug_logger.info(f"Thread management - UDP:{ENABLE_UDP}, TCP:{ENABLE_TCP}, Serial:{ENABLE_SERIAL}")
     
     # UDP
     if ENABLE_UDP:
         if udp_thread is None or not udp_thread.is_alive():
-            udp_stop.clear()
-            
             # Choose function based on UDP mode
             if UDP_MODE == "server":
                 debug_logger.debug(f"Starting UDP server thread on port {UDP_PORT}")
-                udp_thread = threading.Thread(target=udp_listener, args=(udp_stop,), daemon=True)
+                udp_thread = ingest_engine.start("UDP", udp_listener)
             else:  # client mode
                 debug_logger.debug(f"Starting UDP client thread to {UDP_TARGET_IP}:{UDP_TARGET_PORT}")
-                udp_thread = threading.Thread(target=udp_client_listener, args=(UDP_TARGET_IP, UDP_TARGET_PORT, udp_stop), daemon=True)
+                udp_thread = ingest_engine.start("UDP", udp_client_listener, UDP_TARGET_IP, UDP_TARGET_PORT)
             
-            udp_thread.start()
             time.sleep(0.5)
             if udp_thread.is_alive():
                 main_logger.info("UDP connection active")
@@ -1191,26 +2883,23 @@ def manage_threads():
     else:
         if udp_thread and udp_thread.is_alive():
             debug_logger.debug("Stopping UDP thread")
-            udp_stop.set()
+            udp_thread.stop()
             udp_thread = None
             
     # TCP
     if ENABLE_TCP:
         if tcp_thread is None or not tcp_thread.is_alive():
-            tcp_stop.clear()
-            
             # Choose function based on TCP mode
             if TCP_MODE == "server":
                 debug_logger.debug(f"Starting TCP server on port {TCP_PORT}")
-                tcp_thread = threading.Thread(target=tcp_listener, args=(tcp_stop,), daemon=True)
+                tcp_thread = ingest_engine.start("TCP", tcp_listener)
             elif TCP_MODE == "client":  # explicit client mode
                 debug_logger.debug(f"Starting TCP client to {TCP_TARGET_IP}:{TCP_TARGET_PORT}")
-                tcp_thread = threading.Thread(target=tcp_client, args=(tcp_stop,), daemon=True)
+                tcp_thread = ingest_engine.start("TCP", tcp_client)
             else:
                 error_logger.error(f"Invalid TCP_MODE: {TCP_MODE}, using client mode as fallback")
-                tcp_thread = threading.Thread(target=tcp_client, args=(tcp_stop,), daemon=True)
+                tcp_thread = ingest_engine.start("TCP", tcp_client)
             
-            tcp_thread.start()
             time.sleep(0.5)
             if tcp_thread.is_alive():
                 main_logger.info("TCP connection active")
@@ -1221,33 +2910,47 @@ def manage_threads():
     else:
         if tcp_thread and tcp_thread.is_alive():
             debug_logger.debug("Stopping TCP thread")
-            tcp_stop.set()
+            tcp_thread.stop()
             tcp_thread = None
 
-    # SERIAL - only if not AUTO or if AUTO is resolved
+    # SERIAL - every configured source, each with its own reader greenlet;
+    # the primary port in AUTO mode is left to the Bluetooth discovery
     if ENABLE_SERIAL:
-        actual_port = SERIAL_PORT
-        
-        if SERIAL_PORT == "AUTO":
-            debug_logger.debug("AUTO mode - waiting for Bluetooth discovery...")
-        else:
-            if serial_thread is None or not serial_thread.is_alive():
-                debug_logger.debug(f"Starting serial thread on {actual_port}")
-                serial_stop.clear()
-                serial_thread = threading.Thread(target=serial_listener, args=(actual_port, SERIAL_BAUDRATE, serial_stop), daemon=True)
-                serial_thread.start()
+        configured = serial_sources()
+        wanted = {tag for tag, _, _ in configured}
+        for tag in list(serial_threads):
+            if tag not in wanted:
+                debug_logger.debug(f"Stopping serial source {tag} (no longer configured)")
+                stop_serial_source(tag)
+
+        for tag, port, baudrate in configured:
+            if not port or port == "None":
+                continue
+            if port == "AUTO":
+                debug_logger.debug("AUTO mode - waiting for Bluetooth discovery...")
+            elif not serial_source_alive(tag):
+                debug_logger.debug(f"Starting serial source {tag} on {port} @ {baudrate}")
+                start_serial_source(tag, port, baudrate)
                 time.sleep(0.5)
-                if serial_thread.is_alive():
-                    main_logger.info("Serial connection active")
+                if serial_source_alive(tag):
+                    main_logger.info(f"Serial connection active ({tag} {port})")
                 else:
-                    error_logger.error("Serial thread failed to start")
+                    error_logger.error(f"Serial source {tag} failed to start")
             else:
-                debug_logger.debug("Serial thread already active")
+                debug_logger.debug(f"Serial source {tag} already active")
     else:
-        if serial_thread and serial_thread.is_alive():
-            debug_logger.debug("Stopping serial thread")
-            serial_stop.set()
-            serial_thread = None
+        for tag in list(serial_threads):
+            debug_logger.debug(f"Stopping serial source {tag}")
+            stop_serial_source(tag)
+
+    # Synthetic traffic (load testing)
+    if SYNTHETIC_TRAFFIC:
+        if not synthetic_running():
+            debug_logger.debug(f"Starting synthetic traffic: {SYNTHETIC_VESSELS} vessels")
+            ingest_engine.start("SYNTH", synthetic_traffic_source, SYNTHETIC_VESSELS, SYNTHETIC_RATE)
+    elif synthetic_running():
+        debug_logger.debug("Stopping synthetic traffic")
+        ingest_engine.stop("SYNTH")
     
     # Thread status summary (only log active connections)
     active_connections = []
@@ -1255,8 +2958,11 @@ def manage_threads():
         active_connections.append("UDP")
     if tcp_thread and tcp_thread.is_alive():
         active_connections.append("TCP")
-    if serial_thread and serial_thread.is_alive():
-        active_connections.append("Serial")
+    active_serial = [tag for tag in serial_threads if serial_source_alive(tag)]
+    if active_serial:
+        active_connections.append(f"Serial({', '.join(active_serial)})")
+    if synthetic_running():
+        active_connections.append("Synthetic")
     
     if active_connections:
         main_logger.info(f"Active connections: {', '.join(active_connections)}")
@@ -1535,13 +3241,12 @@ def test_ports_separately():
             tcp_sock.close()
         except Exception as e:
             main_logger.warning(f"TCP port {TCP_PORT} unavailable: {e}")
-        main_logger.info(f"[TEST] ERROR TCP port {TCP_PORT} problem: {e}")
 
 # Call this function in main_thread() before manage_threads()
 
 
 def main_thread():
-    global SERIAL_PORT, ENABLE_SERIAL, serial_thread
+    global SERIAL_PORT, ENABLE_SERIAL, nmea_udp_output, capture_store
     
     # Service mode logging (only essential info)
     if SERVICE_MODE:
@@ -1553,7 +3258,7 @@ def main_thread():
             if ENABLE_TCP:
                 enabled_services.append(f"TCP({TCP_MODE})")
             if ENABLE_SERIAL:
-                enabled_services.append(f"Serial({SERIAL_PORT})")
+                enabled_services.append(f"Serial({', '.join(port for _, port, _ in serial_sources())})")
             log_file.write(f"[{datetime.datetime.now()}] Services: {', '.join(enabled_services) if enabled_services else 'None'}\n")
     
     # Startup summary
@@ -1575,7 +3280,7 @@ def main_thread():
         enabled_services.append(service_info)
     
     if ENABLE_SERIAL:
-        enabled_services.append(f"Serial {SERIAL_PORT}")
+        enabled_services.append("Serial " + ", ".join(f"{port} @ {baudrate}" for _, port, baudrate in serial_sources()))
     
     if enabled_services:
         main_logger.info(f"NMEA Services: {', '.join(enabled_services)}")
@@ -1593,20 +3298,51 @@ def main_thread():
             main_logger.info(f"Serial port detected: {SERIAL_PORT}")
             
             # Start serial thread immediately if a port is detected
-            if serial_thread is None or not serial_thread.is_alive():
+            if not serial_source_alive("SERIAL"):
                 debug_logger.debug(f"Starting serial thread on port: {SERIAL_PORT}")
-                serial_stop.clear()
-                serial_thread = threading.Thread(target=serial_listener, args=(SERIAL_PORT, SERIAL_BAUDRATE, serial_stop), daemon=True)
-                serial_thread.start()
+                start_serial_source("SERIAL", SERIAL_PORT, SERIAL_BAUDRATE)
+        elif SERIAL_SOURCES:
+            main_logger.warning("No serial port detected - only the SERIAL_SOURCES inputs will be read")
         else:
             main_logger.warning("No serial port detected - serial disabled")
             ENABLE_SERIAL = False
     
+    # Start the SocketIO emitter workers before any listener produces data
+    emit_dispatcher.start()
+    if SOCKETIO_BATCH_MODE:
+        socketio_batcher.start()
+    vessel_table.start()
+    ais_forwarder.start()
+    if NMEA_TCP_OUTPUT:
+        nmea_tcp_output.start()
+    if NMEA_UDP_OUTPUT:
+        udp_output = NMEAUDPOutput(
+            udp_output_targets(),
+            mtu=NMEA_UDP_OUTPUT_MTU,
+            flush_ms=NMEA_UDP_OUTPUT_FLUSH_MS,
+            ttl=NMEA_UDP_OUTPUT_TTL
+        )
+        if udp_output.start():
+            nmea_udp_output = udp_output
+    if CAPTURE_ENABLED:
+        capture = CaptureWriter(CAPTURE_DIR, CAPTURE_SEGMENT_MB * 1024 * 1024, CAPTURE_COMMIT_MS / 1000.0, CAPTURE_RETENTION_HOURS)
+        try:
+            capture.start()
+            capture_store = capture
+        except OSError as e:
+            error_logger.error(f"[CAPTURE] Cannot record to {CAPTURE_DIR}: {e}")
+
     # Test ports separately if enabled
     test_ports_separately()
 
     # Start threads for UDP, TCP and Serial if enabled
     manage_threads()
+
+    if REPLAY_SOURCE:
+        try:
+            start_replay(REPLAY_SOURCE, REPLAY_SPEED, parse_replay_time(REPLAY_START), parse_replay_time(REPLAY_END), REPLAY_LOOP)
+        except ValueError as e:
+            error_logger.error(f"[REPLAY] Invalid REPLAY_START/REPLAY_END: {e}")
     
     # Start daemon threads for test data and cleanup - AFTER main initialization
     main_logger.info("[INFO] Starting background daemon threads...")
@@ -1687,6 +3423,7 @@ def home():
         serial_ports=serial_ports,
         serial_port=SERIAL_PORT,
         serial_baudrate=SERIAL_BAUDRATE,
+        serial_sources=SERIAL_SOURCES,
         marinetraffic_ip=MARINETRAFFIC_IP,
         marinetraffic_port=MARINETRAFFIC_PORT,
         marinetraffic_id=MARINETRAFFIC_ID
@@ -1695,7 +3432,7 @@ def home():
 @app.route('/select_connection', methods=['POST'])
 def select_connection():
     global ENABLE_SERIAL, ENABLE_UDP, ENABLE_TCP, DEBUG
-    global UDP_IP, UDP_PORT, TCP_IP, TCP_PORT, SERIAL_PORT, SERIAL_BAUDRATE
+    global UDP_IP, UDP_PORT, TCP_IP, TCP_PORT, SERIAL_PORT, SERIAL_BAUDRATE, SERIAL_SOURCES
 
     ENABLE_SERIAL = 'enable_serial' in request.form
     ENABLE_UDP = 'enable_udp' in request.form
@@ -1719,6 +3456,7 @@ def select_connection():
         SERIAL_BAUDRATE = int(request.form.get('serial_baudrate', SERIAL_BAUDRATE))
     except (ValueError, TypeError):
         pass
+    SERIAL_SOURCES = request.form.get('serial_sources', SERIAL_SOURCES).strip()
     # Restart threads with new configuration
     manage_threads()
     return redirect(url_for('home'))
@@ -2042,6 +3780,11 @@ class ConfigWatcher:
         
     def start_watching(self):
         """Start watching config file for changes"""
+        # The file as it is now was loaded at startup: only later edits trigger a reload
+        # (an immediate reload would start listeners before test_ports_separately() runs)
+        if os.path.exists(self.config_file):
+            self.last_modified = os.path.getmtime(self.config_file)
+
         def watch():
             while self.running:
                 try:
@@ -2067,19 +3810,16 @@ class ConfigWatcher:
 def reload_configuration():
     """Reload configuration and restart connections"""
     global ENABLE_SERIAL, ENABLE_UDP, ENABLE_TCP, DEBUG
-    global UDP_IP, UDP_PORT, TCP_IP, TCP_PORT, SERIAL_PORT, SERIAL_BAUDRATE
+    global UDP_IP, UDP_PORT, TCP_IP, TCP_PORT, SERIAL_PORT, SERIAL_BAUDRATE, SERIAL_SOURCES, SERIAL_AUTOBAUD
     global UDP_MODE, TCP_MODE, UDP_TARGET_IP, UDP_TARGET_PORT, TCP_TARGET_IP, TCP_TARGET_PORT
+    global SYNTHETIC_TRAFFIC, SYNTHETIC_VESSELS, SYNTHETIC_RATE
     
     try:
         main_logger.info("[CONFIG] Reloading configuration...")
         
-        # Stop existing threads
-        serial_stop.set()
-        udp_stop.set() 
-        tcp_stop.set()
-        
-        # Wait for threads to stop
-        time.sleep(2)
+        # Stop the input sources (cancellation closes their sockets/ports before returning);
+        # a running replay is not tied to the connection settings and keeps playing
+        ingest_engine.stop_all(keep=("REPLAY",))
         
         # Reload environment variables
         load_dotenv(override=True)
@@ -2105,6 +3845,14 @@ def reload_configuration():
         
         SERIAL_PORT = os.getenv("SERIAL_PORT", DEFAULT_SERIAL_PORT).strip()
         SERIAL_BAUDRATE = int(os.getenv("SERIAL_BAUDRATE", 4800))
+        SERIAL_SOURCES = os.getenv("SERIAL_SOURCES", "").strip()
+        SERIAL_AUTOBAUD = os.getenv("SERIAL_AUTOBAUD", "True").lower() == "true"
+        # Baud rates may have changed: serial sources probe again instead of reusing a detected rate
+        serial_detected_baudrates.clear()
+
+        SYNTHETIC_TRAFFIC = os.getenv("SYNTHETIC_TRAFFIC", "False").lower() == "true"
+        SYNTHETIC_VESSELS = min(max(int(os.getenv("SYNTHETIC_VESSELS", "50")), 0), 100000)
+        SYNTHETIC_RATE = max(float(os.getenv("SYNTHETIC_RATE", "0")), 0.0)
         
         main_logger.info(f"[CONFIG] New configuration loaded:")
         main_logger.info(f"  - Serial: {ENABLE_SERIAL} (Port: {SERIAL_PORT})")
@@ -2122,7 +3870,7 @@ def reload_configuration():
 
 def get_current_status():
     """Returns current status of all connections"""
-    global udp_thread, tcp_thread, serial_thread, bluetooth_manager
+    global udp_thread, tcp_thread, bluetooth_manager
     
     # Safe thread verification
     try:
@@ -2147,7 +3895,7 @@ def get_current_status():
         # Check serial/bluetooth status
         serial_connected = False
         if ENABLE_SERIAL:
-            if serial_thread is not None and hasattr(serial_thread, 'is_alive') and serial_thread.is_alive():
+            if any(serial_source_alive(tag) for tag in serial_threads):
                 serial_connected = True
             elif IS_LINUX and bluetooth_manager is not None:
                 try:
@@ -2173,7 +3921,29 @@ def get_current_status():
         # 🆕 Ajout des informations de configuration
         'udp_enabled': ENABLE_UDP,
         'tcp_enabled': ENABLE_TCP,
-        'serial_enabled': ENABLE_SERIAL
+        'serial_enabled': ENABLE_SERIAL,
+        'serial_sources': [
+            {'tag': tag, 'port': port,
+             'baudrate': serial_detected_baudrates.get(port, baudrate) if SERIAL_AUTOBAUD else baudrate,
+             'configured_baudrate': baudrate, 'active': serial_source_alive(tag)}
+            for tag, port, baudrate in serial_sources()
+        ],
+        'emit_queue': emit_dispatcher.get_stats(),
+        'socketio_batch': socketio_batcher.get_stats(),
+        'parser': nmea_parser.get_stats(),
+        'dedup': nmea_dedup.get_stats(),
+        'history': nmea_history.get_stats(),
+        'capture': capture_store.get_stats() if capture_store is not None else None,
+        'replay': replay_session.get_stats() if replay_session is not None else None,
+        'rate_limit': rate_limiter.get_stats(),
+        'routing': output_router.get_stats(),
+        'ais_decoder': ais_decoder.get_stats(),
+        'vessels': vessel_table.get_stats(),
+        'ingest': ingest_engine.get_stats(),
+        'tcp_server': tcp_ingest_server.get_stats() if tcp_ingest_server is not None else None,
+        'tcp_output': nmea_tcp_output.get_stats(),
+        'udp_output': nmea_udp_output.get_stats() if nmea_udp_output is not None else None,
+        'ais_forward': ais_forwarder.get_stats()
     }
     
     if DEBUG:
@@ -2186,7 +3956,7 @@ def get_current_status():
 def api_update_config():
     """Update configuration with immediate reload"""
     global ENABLE_SERIAL, ENABLE_UDP, ENABLE_TCP, DEBUG
-    global UDP_IP, UDP_PORT, TCP_IP, TCP_PORT, SERIAL_PORT, SERIAL_BAUDRATE
+    global UDP_IP, UDP_PORT, TCP_IP, TCP_PORT, SERIAL_PORT, SERIAL_BAUDRATE, SERIAL_SOURCES
     global UDP_MODE, TCP_MODE, UDP_TARGET_IP, UDP_TARGET_PORT, TCP_TARGET_IP, TCP_TARGET_PORT
     
     try:
@@ -2233,6 +4003,7 @@ def api_update_config():
             SERIAL_BAUDRATE = int(request.form.get('serial_baudrate', SERIAL_BAUDRATE))
         except (ValueError, TypeError):
             pass
+        SERIAL_SOURCES = request.form.get('serial_sources', SERIAL_SOURCES).strip()
         
 
         # MarineTraffic config
@@ -2243,6 +4014,7 @@ def api_update_config():
         except (ValueError, TypeError):
             MARINETRAFFIC_PORT = 12435
         MARINETRAFFIC_ID = request.form.get('marinetraffic_id', os.getenv('MARINETRAFFIC_ID', '7115'))
+        ais_forwarder.configure(ais_forward_destinations())
 
         config_lines = [
             f'ENABLE_SERIAL={"true" if ENABLE_SERIAL else "false"}',
@@ -2261,11 +4033,21 @@ def api_update_config():
             f'TCP_TARGET_PORT={TCP_TARGET_PORT}',
             f'SERIAL_PORT={SERIAL_PORT}',
             f'SERIAL_BAUDRATE={SERIAL_BAUDRATE}',
+            f'SERIAL_SOURCES={SERIAL_SOURCES}',
             f'MARINETRAFFIC_IP={MARINETRAFFIC_IP}',
             f'MARINETRAFFIC_PORT={MARINETRAFFIC_PORT}',
             f'MARINETRAFFIC_ID={MARINETRAFFIC_ID}'
         ]
 
+        # Keep settings that are not managed by the form (emit queue, etc.)
+        managed_keys = {line.split('=', 1)[0] for line in config_lines}
+        if os.path.exists('.env'):
+            with open('.env', 'r') as f:
+                for line in f.read().splitlines():
+                    key = line.split('=', 1)[0].strip()
+                    if '=' in line and key and not key.startswith('#') and key not in managed_keys:
+                        config_lines.append(line)
+
         with open('.env', 'w') as f:
             f.write('\n'.join(config_lines))
         
@@ -2324,11 +4106,101 @@ def api_status():
 
 @app.route('/api/nmea_history')
 def api_nmea_history():
-    """Récupérer l'historique des données NMEA"""
+    """Récupérer l'historique des données NMEA
+
+    ?since=SEQ   sentences after sequence SEQ (oldest first); without it the latest ones
+    ?limit=N     at most N sentences (default 20)
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), nmea_history.capacity)
+        since = request.args.get('since')
+        if since is None:
+            entries, gap = nmea_history.latest(limit), False
+        else:
+            entries, gap = nmea_history.since(max(int(since), 0), limit)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'since and limit must be integers'}), 400
     return jsonify({
         'success': True,
-        'data': last_nmea_data[-20:],  # Les 20 dernières
-        'count': len(last_nmea_data)
+        'data': [NMEAHistory.to_dict(entry) for entry in entries],
+        'count': len(entries),
+        'last_seq': nmea_history.last_seq,
+        'oldest_seq': nmea_history.oldest_seq,
+        'epoch': nmea_history.epoch,
+        'gap': gap
+    })
+
+@app.route('/api/replay', methods=['GET', 'POST', 'DELETE'])
+def api_replay():
+    """Replay a recording through the pipeline
+
+    GET      state of the current replay
+    POST     path=CAPTURE_DIR (or below)|logs/nmea_data.log[.N], speed=1 (0 = full speed), start=, end= (ISO 8601 or epoch), loop=true
+    DELETE   stop the replay
+    """
+    if request.method == 'POST':
+        path = request.values.get('path', '').strip() or REPLAY_SOURCE
+        if not path:
+            return jsonify({'success': False, 'error': 'path is required'}), 400
+        # Remote clients may only replay recordings (REPLAY_SOURCE is set by the operator)
+        if path != REPLAY_SOURCE and not replay_path_allowed(path):
+            return jsonify({'success': False, 'error': 'path must be in CAPTURE_DIR or logs/nmea_data.log'}), 403
+        if not (os.path.isdir(path) or nmea_log_files(path)):
+            return jsonify({'success': False, 'error': f"No recording at {path}"}), 404
+        try:
+            session = start_replay(
+                path,
+                float(request.values.get('speed', REPLAY_SPEED)),
+                parse_replay_time(request.values.get('start')),
+                parse_replay_time(request.values.get('end')),
+                request.values.get('loop', 'false').lower() == 'true'
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f"Invalid speed or time range: {e}"}), 400
+        return jsonify({'success': True, 'replay': session.get_stats()})
+    if request.method == 'DELETE':
+        stop_replay()
+    return jsonify({
+        'success': True,
+        'running': replay_running(),
+        'replay': replay_session.get_stats() if replay_session is not None else None
+    })
+
+@app.route('/api/vessels')
+def api_vessels():
+    """Vessels from the vessel table, optionally filtered by area
+
+    ?bbox=west,south,east,north          (degrees, Leaflet toBBoxString() order)
+    ?near=lat,lon&radius=NM              (nearest first, default radius 10 NM)
+    """
+    try:
+        start = time.perf_counter()
+        bbox = request.args.get('bbox')
+        near = request.args.get('near')
+        if bbox:
+            west, south, east, north = [float(v) for v in bbox.split(',')]
+            if not (-90.0 <= south <= north <= 90.0 and -180.0 <= west <= 180.0 and -180.0 <= east <= 180.0):
+                raise ValueError("bbox out of range")
+            vessels = vessel_table.in_bbox(south, west, north, east)
+        elif near:
+            lat, lon = [float(v) for v in near.split(',')]
+            radius = float(request.args.get('radius', 10))
+            if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0 and radius > 0):
+                raise ValueError("near/radius out of range")
+            vessels = vessel_table.near(lat, lon, radius)
+        else:
+            vessels = vessel_table.snapshot()
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f"Invalid query: {e}"
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'vessels': vessels,
+        'count': len(vessels),
+        'query_ms': round((time.perf_counter() - start) * 1000, 3)
     })
 
 # WebSocket connection tracking to prevent emissions to dead connections
@@ -2381,6 +4253,903 @@ class SocketIOCircuitBreaker:
 # Global circuit breaker instance
 socketio_circuit_breaker = SocketIOCircuitBreaker()
 
+# === SOCKETIO EMIT DISPATCHER ===
+# Listeners push accepted sentences into one bounded queue; a fixed pool of
+# long-lived workers performs the actual SocketIO emissions. This replaces the
+# two short-lived threads previously started for every sentence.
+class EmitDispatcher:
+    """Bounded queue drained by a fixed set of long-lived emitter workers"""
+    OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+    def __init__(self, handler, maxsize=2000, workers=2, overflow_policy='drop_oldest', name="EMIT"):
+        if overflow_policy not in self.OVERFLOW_POLICIES:
+            error_logger.error(f"[{name}] Invalid overflow policy '{overflow_policy}', using drop_oldest")
+            overflow_policy = 'drop_oldest'
+        self.handler = handler
+        self.maxsize = max(1, maxsize)
+        self.worker_count = max(1, workers)
+        self.overflow_policy = overflow_policy
+        self.name = name
+        self.queue = collections.deque()
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.stop_event = threading.Event()
+        self.workers = []
+        self.stats = {
+            'enqueued': 0,
+            'dispatched': 0,
+            'dropped_oldest': 0,
+            'dropped_newest': 0,
+            'blocked': 0,
+            'errors': 0,
+            'max_depth': 0
+        }
+
+    def start(self):
+        """Start the worker pool (no-op for workers already running)"""
+        self.stop_event.clear()
+        self.workers = [w for w in self.workers if w.is_alive()]
+        while len(self.workers) < self.worker_count:
+            worker = threading.Thread(target=self._worker, name=f"{self.name}-worker-{len(self.workers)}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        main_logger.info(f"[{self.name}] {self.worker_count} emitter worker(s) started (queue: {self.maxsize}, overflow: {self.overflow_policy})")
+
+    def stop(self, timeout=2.0):
+        """Stop the workers; pending items are discarded"""
+        self.stop_event.set()
+        with self.lock:
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+        for worker in self.workers:
+            worker.join(timeout=timeout)
+        self.workers = []
+
+    def submit(self, item):
+        """Queue an item for emission. Returns False if it was dropped."""
+        with self.lock:
+            if len(self.queue) >= self.maxsize:
+                if self.overflow_policy == 'drop_newest':
+                    self.stats['dropped_newest'] += 1
+                    return False
+                elif self.overflow_policy == 'drop_oldest':
+                    self.queue.popleft()
+                    self.stats['dropped_oldest'] += 1
+                else:  # block until a worker frees a slot
+                    self.stats['blocked'] += 1
+                    while len(self.queue) >= self.maxsize and not self.stop_event.is_set():
+                        self.not_full.wait(0.5)
+                    if self.stop_event.is_set():
+                        return False
+
+            self.queue.append(item)
+            self.stats['enqueued'] += 1
+            if len(self.queue) > self.stats['max_depth']:
+                self.stats['max_depth'] = len(self.queue)
+            self.not_empty.notify()
+        return True
+
+    def _worker(self):
+        """Worker loop: wait for items and hand them to the handler"""
+        while not self.stop_event.is_set() and not shutdown_event.is_set():
+            with self.lock:
+                while not self.queue and not self.stop_event.is_set():
+                    self.not_empty.wait(1.0)
+                if self.stop_event.is_set():
+                    return
+                item = self.queue.popleft()
+                self.stats['dispatched'] += 1
+                self.not_full.notify()
+
+            try:
+                self.handler(item)
+            except Exception as e:
+                with self.lock:
+                    self.stats['errors'] += 1
+                if DEBUG:
+                    debug_logger.debug(f"[{self.name}] Handler error: {e}")
+
+    def get_stats(self):
+        """Queue depth and counters for /api/status"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['depth'] = len(self.queue)
+        stats['maxsize'] = self.maxsize
+        stats['workers'] = len([w for w in self.workers if w.is_alive()])
+        stats['overflow_policy'] = self.overflow_policy
+        return stats
+
+# Clients that subscribed to batched delivery (they are skipped by per-sentence emits)
+batch_clients = set()
+
+class SocketIOBatcher:
+    """Coalesces sentences into one 'nmea_batch' event per time window or per N messages"""
+    def __init__(self, window_ms=100, max_messages=200, room='nmea_batch'):
+        self.window = window_ms / 1000.0
+        self.max_messages = max_messages
+        self.room = room
+        self.pending = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.stats = {'batches': 0, 'messages': 0}
+
+    def start(self):
+        """Start the periodic flusher"""
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._flush_loop, name="socketio-batcher", daemon=True)
+            self.thread.start()
+            main_logger.info(f"[BATCH] SocketIO batching active ({int(self.window * 1000)} ms / {self.max_messages} messages)")
+
+    def stop(self):
+        self.stop_event.set()
+        self.flush()
+
+    def add(self, seq, record, timestamp):
+        """Add a sentence to the current window; flush early when the window is full"""
+        entry = {
+            'seq': seq,
+            'source': record.source,
+            'message': record.raw,
+            'type': record.sentence_type,
+            'fields': record.fields,
+            'timestamp': timestamp
+        }
+        with self.lock:
+            self.pending.append(entry)
+            full = len(self.pending) >= self.max_messages
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Emit everything collected so far as a single event"""
+        with self.lock:
+            if not self.pending:
+                return
+            messages, self.pending = self.pending, []
+
+        try:
+            # Viewport subscribers get the batch without raw AIS sentences
+            viewport_sids = [sid for sid in viewport_clients if sid in batch_clients]
+            socketio.emit('nmea_batch', {'messages': messages, 'count': len(messages)},
+                          room=self.room, skip_sid=viewport_sids or None)
+            if viewport_sids:
+                scoped = [entry for entry in messages if entry['type'] not in AIS_SENTENCE_TYPES]
+                if scoped:
+                    for sid in viewport_sids:
+                        socketio.emit('nmea_batch', {'messages': scoped, 'count': len(scoped)}, room=sid)
+            socketio_circuit_breaker.record_success()
+            self.stats['batches'] += 1
+            self.stats['messages'] += len(messages)
+        except Exception as batch_error:
+            socketio_circuit_breaker.record_failure()
+            if DEBUG:
+                debug_logger.debug(f"Batch emit error: {batch_error}")
+
+    def _flush_loop(self):
+        while not self.stop_event.is_set() and not shutdown_event.is_set():
+            self.stop_event.wait(self.window)
+            self.flush()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['pending'] = len(self.pending)
+        stats['enabled'] = SOCKETIO_BATCH_MODE
+        stats['clients'] = len(batch_clients)
+        stats['window_ms'] = int(self.window * 1000)
+        return stats
+
+# Global batcher instance (flusher is started in main_thread() when SOCKETIO_BATCH_MODE is on)
+socketio_batcher = SocketIOBatcher(SOCKETIO_BATCH_WINDOW_MS, SOCKETIO_BATCH_MAX)
+
+def deliver_nmea_to_clients(item):
+    """Emitter worker handler: send one sentence to the Windy plugin and the web interface"""
+    seq, record, timestamp, windy, web = item
+    message = record.raw
+
+    if not connected_clients or not socketio_circuit_breaker.can_emit():
+        return
+
+    # Batch subscribers get this sentence in the next 'nmea_batch' frame instead;
+    # viewport subscribers receive AIS targets only as scoped 'vessel_delta' events
+    skip = set(batch_clients)
+    if batch_clients and web:
+        socketio_batcher.add(seq, record, timestamp)
+    if viewport_clients and record.sentence_type in AIS_SENTENCE_TYPES:
+        skip.update(viewport_clients)
+    if len(skip) >= len(connected_clients):
+        return
+    skip_sids = list(skip) or None
+
+    # Emit for Windy Plugin (pure NMEA string)
+    if windy:
+        try:
+            socketio.emit('nmea_data', message, skip_sid=skip_sids)
+            socketio_circuit_breaker.record_success()
+        except Exception as emit_error:
+            socketio_circuit_breaker.record_failure()
+            # Log only in debug mode to prevent spam
+            if DEBUG:
+                debug_logger.debug(f"SocketIO emit error: {emit_error}")
+
+    # Emit for web interface with source information
+    if web:
+        try:
+            socketio.emit('nmea_data_web', {
+                'seq': seq,
+                'source': record.source,
+                'message': message,
+                'type': record.sentence_type,
+                'fields': record.fields,
+                'timestamp': timestamp
+            }, skip_sid=skip_sids)
+            socketio_circuit_breaker.record_success()
+        except Exception as web_emit_error:
+            socketio_circuit_breaker.record_failure()
+            if DEBUG:
+                debug_logger.debug(f"Web emit error: {web_emit_error}")
+
+# Global emit dispatcher instance (workers are started in main_thread())
+emit_dispatcher = EmitDispatcher(
+    deliver_nmea_to_clients,
+    maxsize=EMIT_QUEUE_SIZE,
+    workers=EMIT_WORKERS,
+    overflow_policy=EMIT_OVERFLOW_POLICY
+)
+
+# === NMEA TCP OUTPUT SERVER ===
+# Republishes every accepted sentence to TCP clients (navigation software).
+# publish() never blocks ingest: each client has a bounded queue drained by
+# its own writer greenlet, and a slow client only loses its oldest sentences.
+
+def parse_output_filters(spec):
+    """Parse "ip=TYPE|TYPE,..." into {ip: frozenset(types)}"""
+    filters = {}
+    for entry in spec.split(','):
+        ip, _, types = entry.strip().partition('=')
+        types = frozenset(t.strip().upper() for t in types.split('|') if t.strip())
+        if ip and types:
+            filters[ip.strip()] = types
+        elif entry.strip():
+            main_logger.warning(f"[TCP-OUT] Ignoring invalid filter entry: '{entry.strip()}'")
+    return filters
+
+class NMEAOutputClient:
+    """One downstream TCP client with its bounded send queue"""
+    __slots__ = ('sock', 'peer', 'types', 'queue', 'wakeup', 'writer', 'stats')
+
+    def __init__(self, sock, peer, types, maxlen):
+        self.sock = sock
+        self.peer = peer
+        self.types = types  # None = every sentence type
+        self.queue = collections.deque(maxlen=maxlen)
+        self.wakeup = gevent.event.Event()
+        self.writer = None
+        self.stats = {'connected_at': time.time(), 'sent': 0, 'bytes': 0, 'dropped': 0}
+
+    def push(self, data):
+        if len(self.queue) == self.queue.maxlen:
+            self.stats['dropped'] += 1  # the deque discards the oldest sentence
+        self.queue.append(data)
+        self.wakeup.set()
+
+class NMEATCPOutputServer:
+    """TCP fan-out server: per-client bounded buffers and sentence-type filters"""
+    def __init__(self, port=10110, max_clients=64, buffer_size=1000, filters=None, bind_ip="0.0.0.0"):
+        self.port = port
+        self.bind_ip = bind_ip
+        self.max_clients = max_clients
+        self.buffer_size = buffer_size
+        self.filters = filters or {}
+        self.clients = {}  # peer -> NMEAOutputClient
+        self.greenlet = None
+        self.stats = {'accepted': 0, 'refused': 0, 'published': 0}
+
+    def start(self):
+        if self.greenlet is None or self.greenlet.dead:
+            self.greenlet = gevent.spawn(self._serve)
+
+    def stop(self):
+        if self.greenlet is not None:
+            self.greenlet.kill(block=False)
+
+    def publish(self, record):
+        """Queue a sentence for every interested client (never blocks)"""
+        data = None
+        for client in list(self.clients.values()):
+            if client.types is not None and record.sentence_type not in client.types:
+                continue
+            if data is None:
+                data = (record.raw + "\r\n").encode('ascii', 'ignore')
+            client.push(data)
+        if data is not None:
+            self.stats['published'] += 1
+
+    def _serve(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((self.bind_ip, self.port))
+            sock.listen(16)
+            main_logger.info(f"[TCP-OUT] NMEA output server on port {self.port} (max {self.max_clients} clients)")
+            while True:
+                conn, addr = sock.accept()
+                if len(self.clients) >= self.max_clients:
+                    self.stats['refused'] += 1
+                    network_logger.warning(f"[TCP-OUT] Refused {addr[0]}:{addr[1]}: {self.max_clients} clients already connected")
+                    conn.close()
+                    continue
+                peer = f"{addr[0]}:{addr[1]}"
+                client = NMEAOutputClient(conn, peer, self.filters.get(addr[0]), self.buffer_size)
+                self.clients[peer] = client
+                self.stats['accepted'] += 1
+                client.writer = gevent.spawn(self._writer, client)
+                main_logger.info(f"[TCP-OUT] Client connected: {peer}"
+                                 + (f" (types {','.join(sorted(client.types))})" if client.types else ""))
+        except Exception as e:
+            if not shutdown_event.is_set():
+                error_logger.error(f"[TCP-OUT] Server error on port {self.port}: {e}")
+        finally:
+            for client in list(self.clients.values()):
+                client.writer.kill(block=False)
+            try:
+                sock.close()
+            except:
+                pass
+            main_logger.info("[TCP-OUT] Stopped.")
+
+    def _writer(self, client):
+        """Drain one client's queue; a slow client blocks only this greenlet"""
+        try:
+            while True:
+                client.wakeup.wait()
+                client.wakeup.clear()
+                while client.queue:
+                    # Coalesce everything queued so far into one send
+                    chunk = b"".join([client.queue.popleft() for _ in range(len(client.queue))])
+                    client.sock.sendall(chunk)
+                    client.stats['bytes'] += len(chunk)
+                    client.stats['sent'] += chunk.count(b"\n")
+        except Exception as e:
+            debug_logger.debug(f"[TCP-OUT] Client {client.peer} disconnected: {e}")
+        finally:
+            self.clients.pop(client.peer, None)
+            try:
+                client.sock.close()
+            except:
+                pass
+            main_logger.info(f"[TCP-OUT] Client disconnected: {client.peer}")
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['enabled'] = NMEA_TCP_OUTPUT
+        stats['port'] = self.port
+        stats['clients'] = {
+            peer: dict(client.stats, queued=len(client.queue),
+                       types=sorted(client.types) if client.types else None)
+            for peer, client in self.clients.items()
+        }
+        return stats
+
+# Global output server (started in main_thread() when NMEA_TCP_OUTPUT is on)
+nmea_tcp_output = NMEATCPOutputServer(
+    NMEA_TCP_OUTPUT_PORT,
+    max_clients=NMEA_TCP_OUTPUT_MAX_CLIENTS,
+    buffer_size=NMEA_TCP_OUTPUT_BUFFER,
+    filters=parse_output_filters(NMEA_TCP_OUTPUT_FILTERS)
+)
+
+# === NMEA UDP OUTPUT ===
+# Republishes accepted sentences over UDP. Sentences are packed into one
+# datagram until the next one would exceed the MTU, and a short flush timer
+# bounds the added latency.
+
+def parse_udp_targets(spec):
+    """Parse "ip:port,ip:port" into [(ip, port)]"""
+    targets = []
+    for entry in spec.split(','):
+        ip, _, port = entry.strip().rpartition(':')
+        try:
+            ipaddress.ip_address(ip)
+            targets.append((ip, int(port)))
+        except ValueError:
+            if entry.strip():
+                main_logger.warning(f"[UDP-OUT] Ignoring invalid target: '{entry.strip()}'")
+    return targets
+
+class NMEAUDPOutput:
+    """Batched UDP republisher (one socket, packed datagrams, periodic flush)"""
+    def __init__(self, targets, mtu=1400, flush_ms=50, ttl=1):
+        self.targets = targets
+        self.mtu = mtu
+        self.flush_interval = flush_ms / 1000.0
+        self.ttl = ttl
+        self.buffer = bytearray()
+        self.buffered = 0
+        self.sock = None
+        self.greenlet = None
+        self.stats = {'sentences': 0, 'datagrams': 0, 'bytes': 0, 'errors': 0, 'oversize': 0}
+
+    def start(self):
+        """Open the socket and start the flush timer; False when there is nothing to publish to"""
+        if not self.targets:
+            main_logger.warning("[UDP-OUT] No UDP output target configured")
+            return False
+        if self.greenlet is not None and not self.greenlet.dead:
+            return True
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Always allowed: subnet broadcasts are not limited to .255 (e.g. a /23 or /30)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        if any(ipaddress.ip_address(ip).is_multicast for ip, _ in self.targets):
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+        self.sock = sock
+        self.greenlet = gevent.spawn(self._flush_loop)
+        main_logger.info(f"[UDP-OUT] Publishing to {', '.join(f'{ip}:{port}' for ip, port in self.targets)} "
+                         f"(MTU {self.mtu}, flush {int(self.flush_interval * 1000)} ms)")
+        return True
+
+    def stop(self):
+        if self.greenlet is not None:
+            self.greenlet.kill(block=False)
+
+    def publish(self, record):
+        """Append a sentence to the pending datagram; send it first if the sentence would not fit"""
+        data = (record.raw + "\r\n").encode('ascii', 'ignore')
+        if len(self.buffer) + len(data) > self.mtu:
+            self.flush()
+            if len(data) > self.mtu:
+                self.stats['oversize'] += 1  # sent alone (IP fragmentation)
+        self.buffer += data
+        self.buffered += 1
+
+    def flush(self):
+        if not self.buffer:
+            return
+        datagram = bytes(self.buffer)
+        count = self.buffered
+        self.buffer.clear()
+        self.buffered = 0
+        for target in self.targets:
+            try:
+                self.sock.sendto(datagram, target)
+                self.stats['datagrams'] += 1
+                self.stats['bytes'] += len(datagram)
+            except OSError as e:
+                self.stats['errors'] += 1
+                if DEBUG:
+                    debug_logger.debug(f"[UDP-OUT] Send error to {target[0]}:{target[1]}: {e}")
+        self.stats['sentences'] += count
+
+    def _flush_loop(self):
+        try:
+            while True:
+                gevent.sleep(self.flush_interval)
+                self.flush()
+        finally:
+            self.flush()
+            self.sock.close()
+            main_logger.info("[UDP-OUT] Stopped.")
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['enabled'] = NMEA_UDP_OUTPUT and self.greenlet is not None and not self.greenlet.dead
+        stats['targets'] = [f"{ip}:{port}" for ip, port in self.targets]
+        stats['sentences_per_datagram'] = round(stats['sentences'] * len(self.targets) / stats['datagrams'], 1) if stats['datagrams'] else 0
+        return stats
+
+def udp_output_targets():
+    """Configured targets, defaulting to UDP_TARGET_IP:UDP_TARGET_PORT; never our own UDP input port"""
+    targets = parse_udp_targets(NMEA_UDP_OUTPUT_TARGETS)
+    if not targets and UDP_TARGET_IP:
+        targets = parse_udp_targets(f"{UDP_TARGET_IP}:{UDP_TARGET_PORT}")
+    input_port = (UDP_PORT if UDP_MODE == "server" else UDP_TARGET_PORT) if ENABLE_UDP else None
+    looped = [t for t in targets if t[1] == input_port]
+    for ip, port in looped:
+        main_logger.warning(f"[UDP-OUT] Skipping target {ip}:{port}: same port as the UDP input (feedback loop)")
+    return [t for t in targets if t not in looped]
+
+# Global UDP output (created in main_thread() when NMEA_UDP_OUTPUT is on)
+nmea_udp_output = None
+
+# === RATE LIMITING ===
+# Token buckets per source tag and per (output, sentence type) rule. Every
+# caller runs as a greenlet of the same hub and a bucket check never yields,
+# so buckets and counters are updated without a lock.
+
+class TokenBucket:
+    """Token bucket: `rate` tokens per second, up to `burst` stored"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, tokens=1, now=None):
+        """Take tokens if available; False means the caller is over its rate"""
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def delay(self, tokens=1, now=None):
+        """Seconds until `tokens` are available"""
+        self._refill(time.monotonic() if now is None else now)
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+def parse_rate_limits(spec):
+    """Parse "KEY=rate,KEY=rate" into {KEY: rate}; rate 0 means unlimited (None)"""
+    limits = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            key, rate = entry.split('=', 1)
+            rate = float(rate)
+            if rate < 0:
+                raise ValueError("negative rate")
+        except ValueError:
+            main_logger.warning(f"[RATE] Ignoring invalid rate limit entry: '{entry}'")
+            continue
+        limits[key.strip().upper()] = rate if rate > 0 else None
+    return limits
+
+class RateLimiter:
+    """Per-source and per-output/sentence-type token buckets with pass/drop counters"""
+    def __init__(self, source_default=1000.0, source_limits=None, sink_limits=None):
+        self.source_default = source_default if source_default > 0 else None
+        self.source_limits = source_limits or {}
+        self.sink_limits = {sink: rules for sink, rules in (sink_limits or {}).items() if rules}
+        self.source_buckets = {}  # source tag -> TokenBucket (None = unlimited)
+        self.sink_buckets = {}  # (sink, rule) -> TokenBucket
+        self.counters = {}  # "source:UDP" / "web:GGA" -> [passed, limited]
+
+    def _count(self, key, passed):
+        counters = self.counters.get(key)
+        if counters is None:
+            counters = self.counters[key] = [0, 0]
+        counters[0 if passed else 1] += 1
+        return passed
+
+    def allow_source(self, source):
+        """False when `source` is over its messages-per-second budget"""
+        try:
+            bucket = self.source_buckets[source]
+        except KeyError:
+            family = source.split(':', 1)[0].upper()
+            rate = self.source_limits.get(source.upper(), self.source_limits.get(family, self.source_default))
+            bucket = self.source_buckets[source] = TokenBucket(rate) if rate else None
+        if bucket is None:
+            return True
+        return self._count('source:' + source.split(':', 1)[0], bucket.consume())
+
+    def forget_source(self, source):
+        """Drop the bucket of a short-lived source (closed TCP connection)"""
+        self.source_buckets.pop(source, None)
+
+    def rule_for(self, sink, talker, sentence_type):
+        """Rate rule of `sink` matching a sentence (talker+type, type, then *); None = unlimited"""
+        rules = self.sink_limits.get(sink)
+        if not rules:
+            return None
+        for rule in (talker + sentence_type, sentence_type, '*'):
+            if rule in rules:
+                return rule if rules[rule] is not None else None
+        return None
+
+    def consume(self, sink, rule):
+        """Take one token from the bucket of `rule` on `sink`"""
+        key = (sink, rule)
+        bucket = self.sink_buckets.get(key)
+        if bucket is None:
+            bucket = self.sink_buckets[key] = TokenBucket(self.sink_limits[sink][rule])
+        return self._count(f"{sink}:{rule}", bucket.consume())
+
+    def allow(self, sink, record):
+        """False when `record` is over the budget of its sentence type on output `sink`"""
+        rule = self.rule_for(sink, record.talker, record.sentence_type)
+        return rule is None or self.consume(sink, rule)
+
+    def get_stats(self):
+        return {
+            'source_default': self.source_default,
+            'sources': dict(self.source_limits),
+            'outputs': {sink: dict(rules) for sink, rules in self.sink_limits.items()},
+            'counters': {key: {'passed': c[0], 'limited': c[1]} for key, c in list(self.counters.items())},
+        }
+
+# Global rate limiter
+rate_limiter = RateLimiter(
+    RATE_LIMIT_SOURCE_DEFAULT,
+    parse_rate_limits(RATE_LIMIT_SOURCES),
+    {
+        'web': parse_rate_limits(RATE_LIMIT_WEB),
+        'windy': parse_rate_limits(RATE_LIMIT_WINDY),
+        'tcp': parse_rate_limits(RATE_LIMIT_TCP_OUTPUT),
+        'udp': parse_rate_limits(RATE_LIMIT_UDP_OUTPUT),
+    },
+)
+
+# === OUTPUT ROUTING ===
+# Each output (sink) is assigned a named profile: the sentence types it
+# receives and their maximum rates. Profiles are compiled into a routing
+# table keyed by talker + sentence type, so a sentence costs one dict lookup
+# plus a token-bucket check for the rate-limited sinks that want it.
+
+BUILTIN_OUTPUT_PROFILES = {
+    'all': '*',
+    'ais': 'VDM|VDO',
+    'position': 'GGA:1|RMC:1|GLL:1|VTG:1|HDT:1|HDG:1',
+    'navigation': '*|VDM:0|VDO:0',
+}
+
+class OutputProfile:
+    """Sentence types (TYPE, TALKER+TYPE or *) accepted by an output, with optional rates"""
+    __slots__ = ('name', 'types', 'rates')
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.types = {}  # type -> accepted
+        self.rates = {}  # type -> messages per second
+        for entry in spec.split('|'):
+            key, _, rate = entry.strip().upper().partition(':')
+            if not key:
+                continue
+            try:
+                rate = float(rate) if rate else None
+            except ValueError:
+                main_logger.warning(f"[ROUTE] Profile '{name}': invalid rate in '{entry.strip()}'")
+                rate = None
+            # TYPE:0 excludes the type (e.g. "*|VDM:0" = everything but AIS)
+            self.types[key] = rate != 0
+            if rate:
+                self.rates[key] = rate
+
+    def accepts(self, talker, sentence_type):
+        for key in (talker + sentence_type, sentence_type, '*'):
+            if key in self.types:
+                return self.types[key]
+        return False
+
+def parse_output_profiles(spec):
+    """Built-in profiles overridden/extended by "name=TYPE[:rate]|...;name=..." """
+    profiles = {name: OutputProfile(name, types) for name, types in BUILTIN_OUTPUT_PROFILES.items()}
+    for entry in spec.split(';'):
+        name, _, types = entry.strip().partition('=')
+        name = name.strip().lower()
+        if name and types.strip():
+            profiles[name] = OutputProfile(name, types)
+        elif entry.strip():
+            main_logger.warning(f"[ROUTE] Ignoring invalid output profile: '{entry.strip()}'")
+    return profiles
+
+class OutputRouter:
+    """Precompiled routing table: (talker, type) -> outputs and the rate rule of each"""
+    MAX_ROUTES = 1024  # distinct talker+type combinations cached
+
+    def __init__(self, profiles, assignments, limiter):
+        self.profiles = profiles
+        self.limiter = limiter
+        self.assignments = {}
+        for sink, name in assignments.items():
+            name = (name or 'all').strip().lower()
+            if name not in profiles:
+                main_logger.warning(f"[ROUTE] Unknown profile '{name}' for output '{sink}', using 'all'")
+                name = 'all'
+            self.assignments[sink] = profiles[name]
+            # Profile rates, overridden by the RATE_LIMIT_<OUTPUT> rules
+            rules = dict(profiles[name].rates)
+            rules.update(limiter.sink_limits.get(sink, {}))
+            if rules:
+                limiter.sink_limits[sink] = rules
+        self.table = {}
+        self.stats = {'compiled': 0}
+
+    def compile(self, talker, sentence_type):
+        """Routing entry of one talker + sentence type: ((sink, rate rule or None), ...)"""
+        return tuple(
+            (sink, self.limiter.rule_for(sink, talker, sentence_type))
+            for sink, profile in self.assignments.items()
+            if profile.accepts(talker, sentence_type)
+        )
+
+    def route(self, record):
+        """Outputs that take `record` now (profile match and rate budget)"""
+        key = record.talker + record.sentence_type
+        entry = self.table.get(key)
+        if entry is None:
+            if len(self.table) >= self.MAX_ROUTES:
+                self.table.clear()
+            entry = self.table[key] = self.compile(record.talker, record.sentence_type)
+            self.stats['compiled'] += 1
+        consume = self.limiter.consume
+        return [sink for sink, rule in entry if rule is None or consume(sink, rule)]
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['profiles'] = {sink: profile.name for sink, profile in self.assignments.items()}
+        stats['routes'] = {key: [sink for sink, _ in entry] for key, entry in list(self.table.items())}
+        return stats
+
+# Global output router
+output_router = OutputRouter(
+    parse_output_profiles(OUTPUT_PROFILES),
+    {
+        'windy': OUTPUT_PROFILE_WINDY,
+        'web': OUTPUT_PROFILE_WEB,
+        'tcp': OUTPUT_PROFILE_TCP,
+        'udp': OUTPUT_PROFILE_UDP,
+        'forward': OUTPUT_PROFILE_FORWARD,
+    },
+    rate_limiter,
+)
+
+# === AIS FORWARDER ===
+# One long-lived UDP socket, bounded queue and sender greenlet per aggregator.
+# The ingest path only appends to the queues; rate limiting, deduplication
+# and the MarineTraffic timestamp suffix are handled by the senders.
+
+AIS_FORWARD_DEDUP_MAX = 8192  # sentences remembered per destination for deduplication
+
+class AISForwardDestination:
+    """One aggregator: socket, queue, sender greenlet, rate limit, dedup and counters"""
+    def __init__(self, name, ip, port, rate=0.0, queue_size=1000, dedup_seconds=10.0, timestamp=False):
+        self.name = name
+        self.address = (ip, port)
+        self.timestamp = timestamp  # MarineTraffic wants ",dd/mm/YYYY HH:MM:SS" appended
+        self.bucket = TokenBucket(rate) if rate > 0 else None  # None = unlimited
+        self.queue = collections.deque(maxlen=queue_size)
+        self.wakeup = gevent.event.Event()
+        self.dedup_seconds = dedup_seconds
+        self.recent = collections.OrderedDict()  # sentence -> last accepted (monotonic), oldest first
+        self.sock = None
+        self.greenlet = None
+        self._stamp = (None, "")
+        self.stats = {'queued': 0, 'sent': 0, 'duplicates': 0, 'dropped': 0, 'rate_limited': 0, 'errors': 0, 'last_sent': None}
+
+    def submit(self, sentence, now):
+        """Queue a sentence unless it was already forwarded within the dedup window"""
+        recent = self.recent
+        if self.dedup_seconds:
+            while recent:
+                oldest, seen = next(iter(recent.items()))
+                if now - seen <= self.dedup_seconds:
+                    break
+                del recent[oldest]
+            if sentence in recent:
+                self.stats['duplicates'] += 1
+                return
+            recent[sentence] = now
+            if len(recent) > AIS_FORWARD_DEDUP_MAX:
+                recent.popitem(last=False)
+        if len(self.queue) == self.queue.maxlen:
+            self.stats['dropped'] += 1
+            dropped = self.stats['dropped']
+            if dropped == 1 or dropped % 1000 == 0:
+                main_logger.warning(f"[AIS-FWD] {self.name} queue full ({self.queue.maxlen}): "
+                                    f"{dropped} sentence(s) dropped so far - raise AIS_FORWARD_RATE/AIS_FORWARD_QUEUE")
+        self.queue.append(sentence)
+        self.stats['queued'] += 1
+        self.wakeup.set()
+
+    def start(self):
+        if self.greenlet is None or self.greenlet.dead:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.greenlet = gevent.spawn(self._sender)
+
+    def stop(self):
+        if self.greenlet is not None:
+            self.greenlet.kill(block=False)
+
+    def _date_suffix(self):
+        """",dd/mm/YYYY HH:MM:SS" formatted at most once per second"""
+        second = int(time.time())
+        if self._stamp[0] != second:
+            self._stamp = (second, time.strftime(",%d/%m/%Y %H:%M:%S", time.localtime(second)))
+        return self._stamp[1]
+
+    def _sender(self):
+        try:
+            while True:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                while self.queue:
+                    if self.bucket is not None and not self.bucket.consume():
+                        self.stats['rate_limited'] += 1
+                        gevent.sleep(self.bucket.delay())
+                        continue
+                    sentence = self.queue.popleft()
+                    suffix = self._date_suffix() if self.timestamp else ""
+                    try:
+                        self.sock.sendto(f"{sentence}{suffix}\r\n".encode("ascii", errors="ignore"), self.address)
+                        self.stats['sent'] += 1
+                        self.stats['last_sent'] = time.time()
+                        if self.stats['sent'] % 100 == 0:
+                            gevent.sleep(0)  # unlimited rate: let the ingest greenlets run during a backlog
+                    except OSError as e:
+                        self.stats['errors'] += 1
+                        if self.stats['errors'] <= 3 or DEBUG:
+                            error_logger.error(f"Failed to send !AIVDx to {self.name}: {e}")
+        finally:
+            self.sock.close()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['destination'] = f"{self.address[0]}:{self.address[1]}"
+        stats['depth'] = len(self.queue)
+        return stats
+
+class AISForwarder:
+    """Fans AIS sentences out to every configured aggregator"""
+    def __init__(self):
+        self.destinations = {}  # name -> AISForwardDestination
+        self.running = False
+
+    def configure(self, destinations):
+        """Replace the destination set (keeps the ones whose settings did not change)"""
+        wanted = {d.name: d for d in destinations}
+        for name, current in list(self.destinations.items()):
+            new = wanted.get(name)
+            if new is None or (new.address, new.timestamp) != (current.address, current.timestamp):
+                current.stop()
+                del self.destinations[name]
+        for name, destination in wanted.items():
+            if name not in self.destinations:
+                self.destinations[name] = destination
+                if self.running:
+                    destination.start()
+                main_logger.info(f"[AIS-FWD] Forwarding to {name} ({destination.address[0]}:{destination.address[1]})")
+
+    def start(self):
+        self.running = True
+        for destination in self.destinations.values():
+            destination.start()
+
+    def stop(self):
+        self.running = False
+        for destination in self.destinations.values():
+            destination.stop()
+
+    def submit(self, record):
+        now = time.monotonic()
+        for destination in self.destinations.values():
+            destination.submit(record.raw, now)
+
+    def get_stats(self):
+        return {name: destination.get_stats() for name, destination in self.destinations.items()}
+
+def ais_forward_destinations():
+    """Destinations from the environment: MarineTraffic (when MARINETRAFFIC_ID is set) + AIS_FORWARD_DESTINATIONS"""
+    options = dict(rate=AIS_FORWARD_RATE, queue_size=AIS_FORWARD_QUEUE, dedup_seconds=AIS_FORWARD_DEDUP_SECONDS)
+    destinations = []
+    if MARINETRAFFIC_ID:
+        destinations.append(AISForwardDestination("marinetraffic", MARINETRAFFIC_IP, int(MARINETRAFFIC_PORT), timestamp=True, **options))
+    for entry in AIS_FORWARD_DESTINATIONS.split(','):
+        name, _, address = entry.strip().partition('=')
+        ip, _, port = address.rpartition(':')
+        try:
+            ipaddress.ip_address(ip)
+            destinations.append(AISForwardDestination(name.strip(), ip, int(port), **options))
+        except ValueError:
+            if entry.strip():
+                main_logger.warning(f"[AIS-FWD] Ignoring invalid destination: '{entry.strip()}'")
+    return destinations
+
+# Global AIS forwarder (senders are started in main_thread())
+ais_forwarder = AISForwarder()
+ais_forwarder.configure(ais_forward_destinations())
+
 # Periodic cleanup of dead connections
 def cleanup_dead_connections():
     """Clean up tracking of dead WebSocket connections"""
@@ -2398,6 +5167,10 @@ def cleanup_dead_connections():
             
             if dead_clients:
                 connected_clients -= dead_clients
+                batch_clients.difference_update(dead_clients)
+                for client_id in dead_clients:
+                    viewport_clients.pop(client_id, None)
+                    viewport_visible.pop(client_id, None)
                 main_logger.info(f"[CLEANUP] Removed {len(dead_clients)} dead WebSocket connections")
     except Exception as e:
         if DEBUG:
@@ -2426,7 +5199,7 @@ def generate_test_nmea_data():
         return  # No clients connected, don't generate data
     
     # Only generate test data if no real data sources are active
-    if not (ENABLE_TCP and tcp_thread and tcp_thread.is_alive()) and not (ENABLE_UDP and udp_thread and udp_thread.is_alive()) and not (ENABLE_SERIAL and serial_thread and serial_thread.is_alive()):
+    if not (ENABLE_TCP and tcp_thread and tcp_thread.is_alive()) and not (ENABLE_UDP and udp_thread and udp_thread.is_alive()) and not (ENABLE_SERIAL and any(serial_source_alive(tag) for tag in serial_threads)) and not replay_running() and not synthetic_running():
         # Generate a test GPS position (moving around France)
         import random, math
         lat_base = 48.8566  # Paris latitude
@@ -2451,7 +5224,8 @@ def generate_test_nmea_data():
         lon_dir = 'E' if lon >= 0 else 'W'
         
         # Generate test GPGGA sentence
-        test_sentence = f"$GPGGA,120000.00,{lat_str},{lat_dir},{lon_str},{lon_dir},1,08,1.0,50.0,M,45.0,M,,*65"
+        body = f"GPGGA,120000.00,{lat_str},{lat_dir},{lon_str},{lon_dir},1,08,1.0,50.0,M,45.0,M,,"
+        test_sentence = f"${body}*{compute_nmea_checksum(body)}"
         
         # Emit test data
         emit_nmea_data("TEST", test_sentence)
@@ -2490,35 +5264,127 @@ def handle_connect():
             socketio_circuit_breaker.reset()
             main_logger.info("[WEBSOCKET] Circuit breaker reset due to new client connection")
         
-        # Envoyer les dernières données NMEA au client qui se connecte - avec timeout
+        # Envoyer l'état complet de la table des navires (les mises à jour suivent en 'vessel_delta')
         try:
-            for formatted_data in last_nmea_data[-10:]:  # Les 10 dernières
-                # Extraire la trame NMEA pure du message formaté
-                if '] ' in formatted_data:
-                    # Format: [timestamp][source] message
-                    nmea_message = formatted_data.split('] ', 2)[-1] if '] ' in formatted_data else formatted_data
-                else:
-                    nmea_message = formatted_data
-                
-                # Envoyer la trame NMEA pure pour le plugin Windy - remove timeout parameter
-                socketio.emit('nmea_data', nmea_message, room=request.sid)
-        except Exception as history_error:
+            vessels = vessel_table.snapshot()
+            socketio.emit('vessel_snapshot', {'vessels': vessels, 'count': len(vessels)}, room=request.sid)
+            vessel_table.stats['snapshots_sent'] += 1
+        except Exception as snapshot_error:
             if DEBUG:
-                debug_logger.debug(f"Error sending history to {request.sid}: {history_error}")
+                debug_logger.debug(f"Error sending vessel snapshot to {request.sid}: {snapshot_error}")
     except Exception as e:
         error_logger.error(f"[WEBSOCKET] Error handling connect: {e}")
 
+@socketio.on('nmea_resume')
+def handle_nmea_resume(data):
+    """Catch-up after a reconnection: {since: last seen seq, epoch, limit} -> 'nmea_history' with what was missed
+
+    A client whose epoch differs saw a previous server instance: its sequence
+    means nothing here, so it gets the latest sentences instead (reset: true).
+    """
+    try:
+        since = max(int((data or {}).get('since', 0)), 0)
+        limit = min(max(int((data or {}).get('limit', nmea_history.capacity)), 1), nmea_history.capacity)
+        epoch = (data or {}).get('epoch')
+    except (TypeError, AttributeError, ValueError) as e:
+        emit('history_error', {'error': f"Invalid resume request: {e}"})
+        return
+    try:
+        reset = bool(epoch) and epoch != nmea_history.epoch
+        if reset:
+            entries = nmea_history.latest(limit)
+            gap = bool(entries) and entries[0][0] > 1
+        else:
+            entries, gap = nmea_history.since(since, limit)
+        emit('nmea_history', {
+            'records': [NMEAHistory.to_dict(entry) for entry in entries],
+            'count': len(entries),
+            'last_seq': nmea_history.last_seq,
+            'epoch': nmea_history.epoch,
+            'reset': reset,
+            'gap': gap
+        })
+    except Exception as e:
+        if DEBUG:
+            debug_logger.debug(f"[WEBSOCKET] Error handling nmea_resume: {e}")
+
 @socketio.on('disconnect')
 def handle_disconnect():
     """Gérer les déconnexions WebSocket avec cleanup"""
     global connected_clients  # Fix variable scope issue
     try:
         connected_clients.discard(request.sid)  # Remove from tracking set
+        batch_clients.discard(request.sid)
+        viewport_clients.pop(request.sid, None)
+        viewport_visible.pop(request.sid, None)
         main_logger.info(f"[WEBSOCKET] Client déconnecté: {request.sid} (remaining: {len(connected_clients)})")
     except Exception as e:
         if DEBUG:
             debug_logger.debug(f"[WEBSOCKET] Error handling disconnect: {e}")
 
+@socketio.on('subscribe_batch')
+def handle_subscribe_batch():
+    """Switch a web client to batched 'nmea_batch' delivery when batching is enabled"""
+    try:
+        if SOCKETIO_BATCH_MODE:
+            join_room(socketio_batcher.room)
+            batch_clients.add(request.sid)
+            debug_logger.debug(f"[WEBSOCKET] Client {request.sid} subscribed to batched delivery")
+        emit('batch_mode', {
+            'enabled': SOCKETIO_BATCH_MODE,
+            'window_ms': SOCKETIO_BATCH_WINDOW_MS,
+            'max_messages': SOCKETIO_BATCH_MAX
+        })
+    except Exception as e:
+        if DEBUG:
+            debug_logger.debug(f"[WEBSOCKET] Error handling subscribe_batch: {e}")
+
+@socketio.on('unsubscribe_batch')
+def handle_unsubscribe_batch():
+    """Return a web client to per-sentence delivery"""
+    try:
+        batch_clients.discard(request.sid)
+        leave_room(socketio_batcher.room)
+    except Exception as e:
+        if DEBUG:
+            debug_logger.debug(f"[WEBSOCKET] Error handling unsubscribe_batch: {e}")
+
+@socketio.on('subscribe_viewport')
+def handle_subscribe_viewport(data):
+    """Scope a client's AIS targets to its map bounds: {south, west, north, east, zoom}"""
+    try:
+        viewport = make_viewport(
+            float(data['south']), float(data['west']), float(data['north']), float(data['east']),
+            VIEWPORT_MARGIN
+        )
+    except (TypeError, KeyError, ValueError) as e:
+        emit('viewport_error', {'error': f"Invalid viewport: {e}"})
+        return
+    try:
+        viewport_clients[request.sid] = viewport
+        # Snapshot of the new area; the client replaces its targets with it
+        vessels = vessel_table.in_viewport(viewport)
+        viewport_visible[request.sid] = {vessel['mmsi'] for vessel in vessels}
+        emit('vessel_snapshot', {'vessels': vessels, 'count': len(vessels), 'viewport': viewport})
+        vessel_table.stats['snapshots_sent'] += 1
+        if DEBUG:
+            debug_logger.debug(f"[WEBSOCKET] Client {request.sid} viewport {viewport} (zoom {data.get('zoom')})")
+    except Exception as e:
+        if DEBUG:
+            debug_logger.debug(f"[WEBSOCKET] Error handling subscribe_viewport: {e}")
+
+@socketio.on('unsubscribe_viewport')
+def handle_unsubscribe_viewport():
+    """Return a client to worldwide AIS delivery"""
+    try:
+        viewport_visible.pop(request.sid, None)
+        if viewport_clients.pop(request.sid, None) is not None:
+            vessels = vessel_table.snapshot()
+            emit('vessel_snapshot', {'vessels': vessels, 'count': len(vessels)})
+    except Exception as e:
+        if DEBUG:
+            debug_logger.debug(f"[WEBSOCKET] Error handling unsubscribe_viewport: {e}")
+
 @socketio.on('request_status')
 def handle_request_status():
     """Gérer les demandes de statut via WebSocket - remove timeout parameter"""
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Synthetic NMEA/AIS traffic generator for load testing
+#
+# Simulates N vessels steering between random waypoints around a centre
+# point (class A and class B, some at anchor) plus an own ship. Vessels report
+# on the ITU-R M.1371 schedule (position every 2-10 s by speed, 30 s for class
+# B, 3 min at anchor, static data every 6 min), or on a compressed schedule
+# when a target rate is given. Output: AIS types 1, 5 (two fragments) and 18,
+# own-ship RMC/GGA/VTG/HDT, all with valid checksums.
+#
+# Standard library only: usable in-process (TrafficGenerator.due/run) and as a
+# sender against a running server.
+#
+# Usage:
+#   python nmea_traffic_generator.py --count 20                            # print sentences
+#   python nmea_traffic_generator.py --udp 127.0.0.1:5005 --vessels 500    # natural AIS rate
+#   python nmea_traffic_generator.py --udp 127.0.0.1:5005 --rate 20000 --duration 60
+#   python nmea_traffic_generator.py --tcp 127.0.0.1:5006 --rate 50000 --max   # unpaced
+#
+# The server limits each input to RATE_LIMIT_SOURCE_DEFAULT messages/s; raise it
+# (e.g. RATE_LIMIT_SOURCES=UDP=0) to measure the emit path itself.
+
+import sys
+import math
+import time
+import heapq
+import random
+import socket
+import argparse
+
+# === NMEA / AIS ENCODING ===
+
+def nmea_checksum(body):
+    """XOR of the characters between $/! and *, as two hex digits"""
+    checksum = 0
+    for char in body.encode('ascii'):
+        checksum ^= char
+    return f"{checksum:02X}"
+
+def nmea_sentence(start, body):
+    return f"{start}{body}*{nmea_checksum(body)}"
+
+# 6-bit value -> AIS payload character
+AIS_ARMOR = [chr(v + 48 if v < 40 else v + 56) for v in range(64)]
+
+class AISBits:
+    """Big-endian bit packer for AIS payloads"""
+    __slots__ = ('value', 'length')
+
+    def __init__(self):
+        self.value = 0
+        self.length = 0
+
+    def uint(self, width, value):
+        self.value = (self.value << width) | (int(value) & ((1 << width) - 1))
+        self.length += width
+        return self
+
+    def text(self, width, value):
+        """6-bit AIS text, padded with '@'"""
+        for char in value.upper().ljust(width // 6, '@')[:width // 6]:
+            code = ord(char)
+            self.uint(6, code - 64 if code >= 64 else code)
+        return self
+
+    def payload(self):
+        """(armored payload, fill bits)"""
+        fill = -self.length % 6
+        value = self.value << fill
+        count = (self.length + fill) // 6
+        armor = AIS_ARMOR
+        chars = [armor[(value >> shift) & 63] for shift in range(6 * (count - 1), -1, -6)]
+        return ''.join(chars), fill
+
+def ais_sentences(payload, fill, channel, sequence_id, max_chars=60):
+    """Wrap a payload in !AIVDM sentences (fragmented above max_chars)"""
+    parts = [payload[i:i + max_chars] for i in range(0, len(payload), max_chars)]
+    total = len(parts)
+    seq = str(sequence_id) if total > 1 else ''
+    return [
+        nmea_sentence('!', f"AIVDM,{total},{number},{seq},{channel},{part},{fill if number == total else 0}")
+        for number, part in enumerate(parts, 1)
+    ]
+
+def ais_rot(degrees_per_minute):
+    """Rate of turn indicator (ROT_AIS = 4.733 * sqrt(ROT))"""
+    rot = min(int(round(4.733 * math.sqrt(abs(degrees_per_minute)))), 126)
+    return rot if degrees_per_minute >= 0 else -rot
+
+def ais_position(lat, lon):
+    return int(round(lon * 600000)), int(round(lat * 600000))
+
+def ais_course(cog, heading):
+    return int(round(cog * 10)) % 3600, int(round(heading)) % 360
+
+def ais_speed(sog):
+    return min(int(round(sog * 10)), 1022)
+
+def encode_type1(vessel, second):
+    """Class A position report"""
+    lon, lat = ais_position(vessel.lat, vessel.lon)
+    cog, heading = ais_course(vessel.cog, vessel.heading)
+    bits = (AISBits().uint(6, 1).uint(2, 0).uint(30, vessel.mmsi).uint(4, vessel.status)
+            .uint(8, ais_rot(vessel.turn_rate)).uint(10, ais_speed(vessel.sog)).uint(1, 1)
+            .uint(28, lon).uint(27, lat).uint(12, cog).uint(9, heading).uint(6, second)
+            .uint(2, 0).uint(3, 0).uint(1, 0).uint(19, 0))
+    return bits.payload()
+
+def encode_type18(vessel, second):
+    """Class B (CS) position report"""
+    lon, lat = ais_position(vessel.lat, vessel.lon)
+    cog, heading = ais_course(vessel.cog, vessel.heading)
+    bits = (AISBits().uint(6, 18).uint(2, 0).uint(30, vessel.mmsi).uint(8, 0)
+            .uint(10, ais_speed(vessel.sog)).uint(1, 0).uint(28, lon).uint(27, lat)
+            .uint(12, cog).uint(9, heading).uint(6, second).uint(2, 0)
+            .uint(1, 1).uint(1, 0).uint(1, 1).uint(1, 1).uint(1, 0).uint(1, 0).uint(1, 0).uint(20, 0))
+    return bits.payload()
+
+def encode_type5(vessel, eta):
+    """Class A static and voyage data (424 bits, two sentences)"""
+    bits = (AISBits().uint(6, 5).uint(2, 0).uint(30, vessel.mmsi).uint(2, 0).uint(30, vessel.imo)
+            .text(42, vessel.callsign).text(120, vessel.name).uint(8, vessel.ship_type)
+            .uint(9, vessel.length * 2 // 3).uint(9, vessel.length - vessel.length * 2 // 3)
+            .uint(6, vessel.beam // 2).uint(6, vessel.beam - vessel.beam // 2).uint(4, 1)
+            .uint(4, eta.tm_mon).uint(5, eta.tm_mday).uint(5, eta.tm_hour).uint(6, eta.tm_min)
+            .uint(8, vessel.draught).text(120, vessel.destination).uint(1, 0).uint(1, 0))
+    return bits.payload()
+
+def nmea_lat_lon(lat, lon):
+    """(ddmm.mmmm, N/S, dddmm.mmmm, E/W)"""
+    alat, alon = abs(lat), abs(lon)
+    lat_deg, lon_deg = int(alat), int(alon)
+    return (f"{lat_deg:02d}{(alat - lat_deg) * 60:07.4f}", 'N' if lat >= 0 else 'S',
+            f"{lon_deg:03d}{(alon - lon_deg) * 60:07.4f}", 'E' if lon >= 0 else 'W')
+
+# === VESSEL SIMULATION ===
+
+# (AIS ship type, class A, speed range in knots, turn rate deg/s, length m, beam m, draught dm)
+VESSEL_KINDS = [
+    (70, True, (10.0, 16.0), 0.3, 190, 30, 110),   # cargo
+    (80, True, (8.0, 14.0), 0.2, 240, 42, 140),    # tanker
+    (60, True, (15.0, 24.0), 0.6, 150, 26, 60),    # passenger
+    (30, True, (3.0, 8.0), 2.0, 25, 8, 35),        # fishing
+    (52, True, (6.0, 12.0), 2.5, 30, 10, 45),      # tug
+    (37, False, (4.0, 8.0), 3.0, 12, 4, 15),       # pleasure craft
+    (36, False, (3.0, 7.0), 2.0, 11, 4, 20),       # sailing
+]
+DESTINATIONS = ["LE HAVRE", "SOUTHAMPTON", "CHERBOURG", "ROTTERDAM", "BREST", "PORTSMOUTH", "ANTWERP", "FISHING GROUNDS"]
+NAME_WORDS = ["NORTH", "STAR", "OCEAN", "MARINER", "WIND", "BLUE", "HORIZON", "ATLANTIC", "SEA", "SPIRIT", "EXPRESS", "LADY"]
+
+NM_PER_DEGREE = 60.0
+STATIC_INTERVAL = 360.0  # type 5 every 6 minutes
+
+class Vessel:
+    """A vessel steering towards random waypoints inside the simulation area"""
+    def __init__(self, index, rng, lat, lon, radius_nm):
+        ship_type, class_a, speeds, turn, length, beam, draught = rng.choice(VESSEL_KINDS)
+        self.rng = rng
+        self.centre = (lat, lon)
+        self.radius_nm = radius_nm
+        self.mmsi = (227 if index % 3 else 235) * 1000000 + 100000 + index  # France / UK
+        self.imo = 9000000 + index if class_a else 0
+        self.class_a = class_a
+        self.ship_type = ship_type
+        self.length, self.beam, self.draught = length, beam, draught
+        self.name = f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {index}"[:20]
+        self.callsign = f"F{index:05d}"[:7]
+        self.destination = rng.choice(DESTINATIONS)
+        self.max_turn = turn  # deg/s
+        self.lat, self.lon = self.random_point()
+        self.waypoint = self.random_point()
+        self.cog = rng.uniform(0.0, 360.0)
+        self.heading = self.cog
+        self.turn_rate = 0.0  # deg/min, for ROT
+        anchored = class_a and rng.random() < 0.1
+        self.status = 1 if anchored else (7 if ship_type == 30 else 0)  # at anchor / fishing / under way
+        self.cruise = 0.0 if anchored else rng.uniform(*speeds)
+        self.sog = self.cruise
+        self.updated = None
+        self.next_static = 0.0
+
+    def random_point(self):
+        distance = self.radius_nm * math.sqrt(self.rng.random()) / NM_PER_DEGREE
+        bearing = self.rng.uniform(0.0, 2 * math.pi)
+        lat = self.centre[0] + distance * math.cos(bearing)
+        lon = self.centre[1] + distance * math.sin(bearing) / math.cos(math.radians(self.centre[0]))
+        return lat, lon
+
+    def interval(self):
+        """Position report interval in seconds (ITU-R M.1371, simplified)"""
+        if not self.class_a:
+            return 30.0 if self.sog > 2.0 else 180.0
+        if self.status == 1:
+            return 180.0
+        if self.sog > 23.0:
+            return 2.0
+        return 6.0 if self.sog > 14.0 else 10.0
+
+    def advance(self, now):
+        """Dead-reckon to `now`, turning towards the waypoint at the vessel's turn rate"""
+        if self.updated is None or self.sog <= 0.0:
+            self.updated = now
+            return
+        dt = now - self.updated
+        self.updated = now
+        if dt <= 0.0:
+            return
+        coslat = math.cos(math.radians(self.lat))
+        dlat = self.waypoint[0] - self.lat
+        dlon = (self.waypoint[1] - self.lon) * coslat
+        if math.hypot(dlat, dlon) * NM_PER_DEGREE < 0.3:
+            self.waypoint = self.random_point()
+            dlat = self.waypoint[0] - self.lat
+            dlon = (self.waypoint[1] - self.lon) * coslat
+        bearing = math.degrees(math.atan2(dlon, dlat)) % 360.0
+        error = (bearing - self.cog + 180.0) % 360.0 - 180.0
+        turn = max(-self.max_turn * dt, min(self.max_turn * dt, error))
+        self.cog = (self.cog + turn) % 360.0
+        self.turn_rate = turn / dt * 60.0
+        self.heading = (self.cog + self.rng.uniform(-2.0, 2.0)) % 360.0  # leeway / current
+        self.sog = max(0.1, self.cruise + self.rng.uniform(-0.3, 0.3))
+        distance = self.sog * dt / 3600.0 / NM_PER_DEGREE
+        course = math.radians(self.cog)
+        self.lat += distance * math.cos(course)
+        self.lon += distance * math.sin(course) / coslat
+
+class OwnShip(Vessel):
+    """The receiving vessel: RMC/GGA/VTG/HDT once per second"""
+    def __init__(self, rng, lat, lon, radius_nm):
+        Vessel.__init__(self, 0, rng, lat, lon, radius_nm)
+        self.lat, self.lon = lat, lon
+        self.status = 0
+        self.cruise = self.sog = 6.5
+        self.max_turn = 3.0
+
+    def interval(self):
+        return 1.0
+
+    def sentences(self, now):
+        lat, ns, lon, ew = nmea_lat_lon(self.lat, self.lon)
+        utc = time.gmtime(now)
+        hhmmss = f"{time.strftime('%H%M%S', utc)}.{int(now * 100) % 100:02d}"
+        return [
+            nmea_sentence('$', f"GPRMC,{hhmmss},A,{lat},{ns},{lon},{ew},{self.sog:.1f},{self.cog:.1f},"
+                               f"{time.strftime('%d%m%y', utc)},,,A"),
+            nmea_sentence('$', f"GPGGA,{hhmmss},{lat},{ns},{lon},{ew},1,10,0.8,4.0,M,47.0,M,,"),
+            nmea_sentence('$', f"GPVTG,{self.cog:.1f},T,,M,{self.sog:.1f},N,{self.sog * 1.852:.1f},K,A"),
+            nmea_sentence('$', f"HEHDT,{self.heading:.1f},T"),
+        ]
+
+# === TRAFFIC GENERATOR ===
+
+class TrafficGenerator:
+    """Schedules vessel reports and returns the sentences due at a given time
+
+    rate=0 keeps the real AIS reporting intervals; a target rate (sentences/s)
+    compresses them uniformly so the AIS traffic alone reaches that rate. The
+    own ship always reports at 1 Hz.
+    """
+    def __init__(self, vessels=50, lat=50.05, lon=-1.20, radius_nm=20.0, rate=0.0, ownship=True, seed=None):
+        self.rng = random.Random(seed)
+        self.vessels = [Vessel(i + 1, self.rng, lat, lon, radius_nm) for i in range(vessels)]
+        self.ownship = OwnShip(self.rng, lat, lon, radius_nm) if ownship else None
+        self.natural_rate = sum(self.report_size(v) / v.interval() for v in self.vessels)
+        self.scale = self.natural_rate / rate if rate and self.natural_rate else 1.0
+        self.sequence_id = 0
+        self.channel = 0
+        self.schedule = []
+        self.stats = {'sentences': 0, 'type1': 0, 'type5': 0, 'type18': 0, 'ownship': 0}
+
+    @staticmethod
+    def report_size(vessel):
+        """Average sentences per report (type 5 adds two every STATIC_INTERVAL)"""
+        return 1.0 + (2.0 * vessel.interval() / STATIC_INTERVAL if vessel.class_a else 0.0)
+
+    def start(self, now):
+        """Spread the first reports over one interval"""
+        self.schedule = []
+        for i, vessel in enumerate(self.vessels):
+            vessel.updated = None
+            vessel.advance(now)
+            vessel.next_static = now
+            heapq.heappush(self.schedule, (now + self.rng.uniform(0.0, vessel.interval() * self.scale), i, vessel))
+        if self.ownship is not None:
+            self.ownship.updated = None
+            self.ownship.advance(now)
+            heapq.heappush(self.schedule, (now, -1, self.ownship))
+
+    def due(self, now):
+        """Sentences of every report due at or before `now` (epoch seconds)"""
+        if not self.schedule:
+            self.start(now)
+            if not self.schedule:
+                return []  # no vessels and no own ship
+        out = []
+        schedule = self.schedule
+        stats = self.stats
+        while schedule[0][0] <= now:
+            at, i, vessel = schedule[0]
+            vessel.advance(at)
+            if vessel is self.ownship:
+                out.extend(vessel.sentences(at))
+                stats['ownship'] += 4
+                heapq.heapreplace(schedule, (at + 1.0, i, vessel))
+                continue
+            channel = 'AB'[self.channel]
+            self.channel ^= 1
+            second = int(at) % 60
+            if vessel.class_a:
+                payload, fill = encode_type1(vessel, second)
+                stats['type1'] += 1
+            else:
+                payload, fill = encode_type18(vessel, second)
+                stats['type18'] += 1
+            out.append(nmea_sentence('!', f"AIVDM,1,1,,{channel},{payload},{fill}"))
+            if vessel.class_a and at >= vessel.next_static:
+                vessel.next_static = at + STATIC_INTERVAL * self.scale
+                payload, fill = encode_type5(vessel, time.gmtime(at + 86400))
+                out.extend(ais_sentences(payload, fill, channel, self.sequence_id))
+                self.sequence_id = (self.sequence_id + 1) % 10
+                stats['type5'] += 1
+            heapq.heapreplace(schedule, (at + vessel.interval() * self.scale, i, vessel))
+        stats['sentences'] += len(out)
+        return out
+
+    def run(self, sink, duration=None, tick=0.01, max_speed=False, clock=time.time, sleep=time.sleep):
+        """Call sink(sentences) every tick until duration elapses; returns the sentences sent
+
+        max_speed advances the simulated clock by one tick per batch without
+        waiting, so the sink sees the target rate's batches back to back.
+        """
+        start = clock()
+        simulated = start
+        sent = 0
+        while duration is None or simulated - start < duration:
+            if max_speed:
+                simulated += tick
+            else:
+                sleep(tick)
+                simulated = clock()
+            sentences = self.due(simulated)
+            if sentences:
+                sink(sentences)
+                sent += len(sentences)
+        return sent
+
+# === SENDERS ===
+
+class UDPSender:
+    """Packs sentences into datagrams of at most mtu bytes"""
+    def __init__(self, host, port, mtu=1400):
+        self.target = (host, port)
+        self.mtu = mtu
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, sentences):
+        datagram = []
+        size = 0
+        for sentence in sentences:
+            line = sentence + "\r\n"
+            if size + len(line) > self.mtu and datagram:
+                self.sock.sendto(''.join(datagram).encode('ascii'), self.target)
+                datagram, size = [], 0
+            datagram.append(line)
+            size += len(line)
+        if datagram:
+            self.sock.sendto(''.join(datagram).encode('ascii'), self.target)
+
+    def close(self):
+        self.sock.close()
+
+class TCPSender:
+    """Streams sentences to a TCP server (the NMEA server with TCP_MODE=server)"""
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def __call__(self, sentences):
+        self.sock.sendall(("\r\n".join(sentences) + "\r\n").encode('ascii'))
+
+    def close(self):
+        self.sock.close()
+
+def parse_address(value):
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic NMEA/AIS traffic generator")
+    parser.add_argument("--vessels", type=int, default=50, help="simulated AIS targets")
+    parser.add_argument("--rate", type=float, default=0.0, help="target AIS sentences/s (0 = real reporting intervals)")
+    parser.add_argument("--lat", type=float, default=50.05, help="centre of the area (default: English Channel)")
+    parser.add_argument("--lon", type=float, default=-1.20)
+    parser.add_argument("--radius", type=float, default=20.0, help="area radius in NM")
+    parser.add_argument("--no-ownship", action="store_true", help="AIS only, no RMC/GGA/VTG/HDT")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--duration", type=float, default=None, help="seconds of traffic, simulated time with --max (default: until Ctrl+C)")
+    parser.add_argument("--max", action="store_true", help="do not pace on the wall clock (saturation test)")
+    parser.add_argument("--tick", type=float, default=0.01, help="batch interval in seconds")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--udp", metavar="HOST:PORT", help="send datagrams (server UDP_MODE=server, port 5005)")
+    target.add_argument("--tcp", metavar="HOST:PORT", help="stream over TCP (server TCP_MODE=server, port 5006)")
+    target.add_argument("--count", type=int, help="print this many sentences and exit")
+    args = parser.parse_args()
+    if args.vessels < 0 or (args.vessels == 0 and args.no_ownship):
+        parser.error("nothing to simulate: use --vessels 1 or more, or drop --no-ownship")
+
+    generator = TrafficGenerator(args.vessels, args.lat, args.lon, args.radius, args.rate,
+                                 ownship=not args.no_ownship, seed=args.seed)
+    if args.count is not None:
+        printed = 0
+        now = time.time()
+        while printed < args.count:
+            for sentence in generator.due(now)[:args.count - printed]:
+                print(sentence)
+                printed += 1
+            now += args.tick
+        return 0
+
+    if args.udp:
+        sender = UDPSender(*parse_address(args.udp))
+    elif args.tcp:
+        sender = TCPSender(*parse_address(args.tcp))
+    else:
+        sender = lambda sentences: sys.stdout.write("\r\n".join(sentences) + "\r\n")  # noqa: E731
+    print(f"{args.vessels} vessels, natural AIS rate {generator.natural_rate:.1f}/s, "
+          f"target {args.rate or generator.natural_rate:,.0f}/s{' (unpaced)' if args.max else ''}", file=sys.stderr)
+
+    window = {'start': time.perf_counter(), 'sent': 0}
+
+    def counting_sender(sentences):
+        sender(sentences)
+        window['sent'] += len(sentences)
+        elapsed = time.perf_counter() - window['start']
+        if elapsed >= 1.0:
+            print(f"{window['sent'] / elapsed:,.0f} sentences/s", file=sys.stderr)
+            window['start'], window['sent'] = time.perf_counter(), 0
+
+    start = time.perf_counter()
+    sent = 0
+    try:
+        sent = generator.run(counting_sender, args.duration, args.tick, args.max)
+    except KeyboardInterrupt:
+        sent = generator.stats['sentences']
+    finally:
+        if hasattr(sender, 'close'):
+            sender.close()
+    elapsed = time.perf_counter() - start
+    print(f"sent {sent:,} sentences in {elapsed:.1f}s ({sent / elapsed:,.0f}/s): {generator.stats}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())